@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Checks that the light subcommands stay fast to start.
+
+For each checked subcommand, a fresh interpreter imports the CLI and the script
+of the subcommand under `python -X importtime`. The check fails if the summed
+import time exceeds the budget of the subcommand, or if one of the heavy modules
+(pandas, geopy, ...) was imported.
+
+Run it after changing the imports of the CLI or of the checked scripts:
+```
+python scripts/check_import_time.py
+```
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from rich import print
+
+# **************** Constants ****************
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Subcommand -> import time budget in microseconds
+BUDGETS = {
+    "stats": 150_000,
+    "query": 150_000,
+}
+HEAVY_MODULES = ("pandas", "geopy", "bs4", "tqdm", "requests", "pyarrow")
+REPETITIONS = 5
+
+# **************** Helpers ****************
+
+
+def measure_import_time(command: str) -> tuple[int, set[str]]:
+    """Measures the import time of a subcommand in a fresh interpreter.
+
+    Args:
+        command: The name of the subcommand.
+
+    Returns:
+        A tuple of the summed import time in microseconds and the names of the
+        imported top-level modules.
+
+    Raises:
+        RuntimeError: If the interpreter fails.
+    """
+    code = f"from aldi_lidl.cli import load_command; load_command({command!r})"
+    # Keep the existing entries, the dependencies may be found through them
+    python_path = os.pathsep.join(
+        filter(None, [str(ROOT / "src"), os.environ.get("PYTHONPATH")])
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": python_path},
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {command} failed:\n{process.stderr}")
+
+    total = 0
+    modules: set[str] = set()
+    for line in process.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented name>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        modules.add(name.strip().split(".")[0])
+        # Nested imports are indented and already part of their parent
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    failed = False
+    for command, budget in BUDGETS.items():
+        # Take the fastest run to reduce the noise of the machine
+        runs = [measure_import_time(command) for _ in range(REPETITIONS)]
+        total, modules = min(runs, key=lambda run: run[0])
+        heavy = sorted(set(HEAVY_MODULES) & modules)
+
+        ok = total <= budget and not heavy
+        failed |= not ok
+        status = "[green]OK[/green]" if ok else "[red]FAILED[/red]"
+        print(f"{status} {command}: {total / 1000:.1f} ms (budget {budget / 1000} ms)")
+        if heavy:
+            print(f"  Imports heavy modules: {', '.join(heavy)}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Checks that the snapshot store handles runs in which no store changed.
+
+The current stores are recorded into a temporary snapshot store, a second time
+without changes and a third time with one store removed. The check fails if the
+run without changes recorded a snapshot, if the events cannot be read back, or if
+an empty delta cannot be read back with a filter on its operation.
+```
+python scripts/check_snapshots.py
+```
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+from rich import print
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "analysis"))
+
+from store_snapshots import (  # noqa: E402
+    SnapshotStore,
+    compute_delta,
+    load_current_stores,
+    save_delta,
+)
+
+# **************** Constants ****************
+
+PATH_TO_DATA = ROOT / "data"
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    stores = load_current_stores(
+        PATH_TO_DATA / "aldi_sued" / "aldi_sued.csv",
+        PATH_TO_DATA / "aldi_nord" / "aldi_nord.csv",
+        PATH_TO_DATA / "lidl" / "lidl.csv",
+    )
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(Path(directory))
+        store.record(stores, START)
+        if store.record(stores, START + timedelta(days=1)) is not None:
+            failures.append("A run without changes recorded a snapshot.")
+        store.record(stores.iloc[1:], START + timedelta(days=2))
+
+        events = store.events(start=START + timedelta(days=1))
+        if len(events) != 1 or events["Operation"].tolist() != ["remove"]:
+            failures.append(f"Expected one closure, got {len(events)} events.")
+        if len(store.manifest) != 2:
+            failures.append(f"Expected 2 snapshots, got {len(store.manifest)}.")
+
+        # An empty delta must keep its string schema
+        path = Path(directory) / "empty.parquet"
+        save_delta(compute_delta(stores, stores), path)
+        if not pd.read_parquet(path, filters=[("Operation", "in", ["add"])]).empty:
+            failures.append("The empty delta is not empty.")
+
+    for failure in failures:
+        print(f"[red]{failure}[/red]")
+    if failures:
+        sys.exit(1)
+    print("[green]The snapshot store handles runs without changes.[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""Checks the scraper throttling against a local fault-injecting stub server.
+
+The stub server allows BUDGET requests per second (a token bucket). Requests
+beyond the budget get a 429 with a `Retry-After` header. In addition, a share of
+the requests randomly fails with a 503 or is answered slowly. Halfway through,
+the server becomes permanently slower by LATENCY_STEP.
+
+A `ThrottledSession` then sends requests to the stub server. The check reports
+the achieved throughput before and after the latency step and how many requests
+were throttled. It fails if a request could not be completed despite the
+retries, if the throughput of a phase is below MIN_THROUGHPUT_FRACTION of what
+the server allows, or if the server throttled more than MAX_THROTTLED requests.
+```
+python scripts/check_throttling.py
+```
+"""
+
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rich import print
+
+from aldi_lidl.throttling import AdaptiveRateController, ThrottledSession
+
+# **************** Constants ****************
+
+HOST = "127.0.0.1"
+BUDGET = 20.0  # requests per second
+BURST = 5
+FAILURE_PROBABILITY = 0.01
+SLOW_PROBABILITY = 0.03
+SLOW_LATENCY = 0.2
+LATENCY_STEP = 0.06
+N_REQUESTS = 1000
+
+MIN_THROUGHPUT_FRACTION = 0.5
+MAX_THROTTLED = 25
+MAX_PHASE_SECONDS = 120
+
+# **************** Stub server ****************
+
+
+class TokenBucket:
+    """A token bucket that allows `rate` requests per second."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initializes a full bucket.
+
+        Args:
+            rate: The number of tokens added per second.
+            burst: The capacity of the bucket.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        """Takes a token if there is one.
+
+        Returns:
+            True if a token was taken.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class FaultInjectingHandler(BaseHTTPRequestHandler):
+    """Answers requests within the budget and injects faults."""
+
+    bucket = TokenBucket(BUDGET, BURST)
+    counts = {"ok": 0, "throttled": 0, "failed": 0}
+    base_latency = 0.0
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Handles a GET request."""
+        if not self.bucket.take():
+            self.counts["throttled"] += 1
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+        elif random.random() < FAILURE_PROBABILITY:
+            self.counts["failed"] += 1
+            self.send_response(503)
+        else:
+            time.sleep(self.base_latency)
+            if random.random() < SLOW_PROBABILITY:
+                time.sleep(SLOW_LATENCY)
+            self.counts["ok"] += 1
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Silences the request log."""
+
+
+# **************** Main ****************
+
+
+def run_phase(
+    session: ThrottledSession, url: str, n_requests: int
+) -> tuple[float, int]:
+    """Sends requests to the stub server for at most MAX_PHASE_SECONDS.
+
+    Args:
+        session: The session to send the requests with.
+        url: The URL of the stub server.
+        n_requests: The number of requests.
+
+    Returns:
+        A tuple of the throughput of successful requests per second and the
+        number of requests that failed despite the retries.
+    """
+    ok_before = FaultInjectingHandler.counts["ok"]
+    failures = 0
+    start = time.monotonic()
+    for _ in range(n_requests):
+        if session.get(url, timeout=5).status_code != 200:
+            failures += 1
+        if time.monotonic() - start > MAX_PHASE_SECONDS:
+            break
+    elapsed = time.monotonic() - start
+    return (FaultInjectingHandler.counts["ok"] - ok_before) / elapsed, failures
+
+
+def main() -> None:
+    """Runs the code."""
+    server = ThreadingHTTPServer((HOST, 0), FaultInjectingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{HOST}:{server.server_port}/"
+
+    # Allow up to twice the budget, so the controller has to find the limit
+    controller = AdaptiveRateController(
+        initial_rate=1.0, max_rate=2 * BUDGET, rate_increase=1.0
+    )
+    session = ThrottledSession(controller, backoff_base=0.1)
+
+    failed = False
+    failures = 0
+    for phase, latency in [("fast server", 0.0), ("slower server", LATENCY_STEP)]:
+        FaultInjectingHandler.base_latency = latency
+        throughput, phase_failures = run_phase(session, url, N_REQUESTS // 2)
+        failures += phase_failures
+        # Requests are sent one after another, so the latency limits the rate
+        allowed = min(BUDGET, 1 / latency) if latency else BUDGET
+        ok = throughput >= MIN_THROUGHPUT_FRACTION * allowed
+        failed |= not ok
+        status = "[green]OK[/green]" if ok else "[red]FAILED[/red]"
+        print(
+            f"{status} {phase}: {throughput:.1f} requests/s "
+            f"({throughput / allowed:.0%} of the {allowed:.1f} requests/s allowed)"
+        )
+    server.shutdown()
+
+    counts = FaultInjectingHandler.counts
+    print(f"Final rate of the controller: {controller.rate:.1f} requests/s")
+    print(f"Throttled (429): {counts['throttled']}, injected 503: {counts['failed']}")
+    print(f"Requests failed after all retries: {failures}")
+    if counts["throttled"] > MAX_THROTTLED:
+        print(f"[red]FAILED[/red] More than {MAX_THROTTLED} requests were throttled.")
+        failed = True
+    if failures or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""The `aldi-lidl` command line interface.
+
+Every subcommand wraps the `main()` function of one of the scripts. The scripts
+import heavy modules (pandas, geopy, bs4, ...) at the top, so they are only
+imported once a subcommand has been chosen. `aldi-lidl stats`, for example, does
+not import pandas at all.
+
+The scripts use paths relative to their own directory, so the working directory
+is changed to the directory of the script before it is run. The scripts and the
+data are not part of the installed package, so the CLI only works in an editable
+install of the repository (`uv sync` or `pip install -e .`).
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+
+# **************** Constants ****************
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Subcommand -> (script relative to ROOT, help, whether main() takes argv)
+COMMANDS: dict[str, tuple[str, str, bool]] = {
+    "pipeline": (
+        "src/pipeline/run_pipeline.py",
+        "Run all stages that are out of date.",
+        True,
+    ),
+    "extract-aldi-sued-urls": (
+        "src/extraction/aldi_sued/aldi_sued_url_extraction.py",
+        "Fetch the Aldi Sued sitemap and extract the store URLs.",
+        False,
+    ),
+    "extract-aldi-sued": (
+        "src/extraction/aldi_sued/aldi_sued_extraction.py",
+        "Crawl the Aldi Sued store pages.",
+        False,
+    ),
+    "extract-aldi-nord": (
+        "src/extraction/aldi_nord/aldi_nord_extraction.py",
+        "Extract the Aldi Nord stores from the JSON dump.",
+        False,
+    ),
+    "extract-lidl-urls": (
+        "src/extraction/lidl/lidl_url_extraction.py",
+        "Crawl the Bing links of the Lidl stores.",
+        False,
+    ),
+    "extract-lidl": (
+        "src/extraction/lidl/lidl_address_parsing.py",
+        "Parse the Lidl addresses from the Bing links.",
+        False,
+    ),
+    "deduplicate": (
+        "src/analysis/deduplicate_stores.py",
+        "Merge stores that were scraped more than once.",
+        False,
+    ),
+    "snapshot": (
+        "src/analysis/store_snapshots.py",
+        "Record the extracted stores as a new snapshot of the store history.",
+        False,
+    ),
+    "store-table": (
+        "src/analysis/store_table.py",
+        "Build the memory-mappable table of all stores.",
+        False,
+    ),
+    "distances": (
+        "src/analysis/min_distances.py",
+        "Compute the distance from every Aldi to the nearest Lidl.",
+        False,
+    ),
+    "regions": (
+        "src/analysis/regional_statistics.py",
+        "Compute the distance statistics per postal code region and city.",
+        False,
+    ),
+    "stats": (
+        "src/analysis/print_statistics.py",
+        "Print the statistics of the minimum distances.",
+        False,
+    ),
+    "serve": (
+        "src/analysis/nearest_store_server.py",
+        "Start the nearest-store query server.",
+        False,
+    ),
+    "query": (
+        "src/analysis/query_nearest_store.py",
+        "Query the nearest store from a running server.",
+        True,
+    ),
+    "load-test": (
+        "src/analysis/load_test_nearest_store.py",
+        "Load test a running nearest-store server.",
+        False,
+    ),
+}
+
+# **************** Helpers ****************
+
+
+def load_command(command: str) -> ModuleType:
+    """Imports the script of a subcommand.
+
+    Args:
+        command: The name of the subcommand.
+
+    Returns:
+        The imported script module.
+    """
+    script = ROOT / COMMANDS[command][0]
+    os.chdir(script.parent)
+    # Scripts import their siblings, e.g. `from deduplicate_stores import ...`
+    sys.path.insert(0, str(script.parent))
+    return importlib.import_module(script.stem)
+
+
+# **************** Main ****************
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Runs the code.
+
+    Args:
+        argv (optional): The command line arguments. Defaults to `sys.argv`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="aldi-lidl", description="Distances between Aldi and Lidl stores."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, (_, help_, takes_argv) in COMMANDS.items():
+        # Commands that take arguments handle `--help` themselves
+        subparsers.add_parser(command, help=help_, add_help=not takes_argv)
+    args, rest = parser.parse_known_args(argv)
+
+    if not (ROOT / COMMANDS[args.command][0]).exists():
+        parser.exit(
+            1,
+            f"aldi-lidl: cannot find the scripts in {ROOT}. Install the project "
+            "in editable mode from the repository (`uv sync` or "
+            "`pip install -e .`).\n",
+        )
+    takes_argv = COMMANDS[args.command][2]
+    if rest and not takes_argv:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    module = load_command(args.command)
+    if takes_argv:
+        module.main(rest)
+    else:
+        module.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Adaptive politeness throttling and retries for the scrapers.
+
+All scrapers send their requests through a `ThrottledSession`. Sessions for the
+same host share one `AdaptiveRateController`, which spaces the requests and
+adapts the request rate to how the server responds:
+
+- after every fast, successful response the rate is raised a little (additive
+  increase); close to the rate at which the server last throttled, it is raised
+  fifty times slower to probe the limit gently,
+- if the responses get slow compared to the recent baseline latency, or the
+  server answers with 429/503 or another server error, the rate is halved
+  (multiplicative decrease, at most once per DECREASE_COOLDOWN seconds); the
+  baseline follows lower latencies at once and drifts slowly towards higher
+  ones, so that a server that is permanently slower is not treated as
+  overloaded forever,
+- a `Retry-After` header pauses all requests to the host for the given time.
+
+Failed requests are retried with jittered exponential backoff.
+"""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+import urllib.parse as ul
+from datetime import datetime, timezone
+from typing import Any
+
+import requests
+
+# **************** Constants ****************
+
+HEADERS = {"User-Agent": "hobby-aldi-scraper/0.1"}
+
+INITIAL_RATE = 1 / 1.2  # the fixed pause of 1.2 seconds used before
+MIN_RATE = 0.05
+MAX_RATE = 2.0
+RATE_INCREASE = 0.02
+RATE_DECREASE = 0.5
+SLOW_LATENCY_FACTOR = 3.0
+SLOW_LATENCY_SLACK = 0.05  # seconds, ignores jitter of very fast servers
+LATENCY_SMOOTHING = 0.3
+BASELINE_DRIFT = 0.02
+DECREASE_COOLDOWN = 1.0  # seconds
+
+RETRY_AFTER_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# **************** Rate controller ****************
+
+
+class AdaptiveRateController:
+    """Spaces requests to one host and adapts the rate to the server.
+
+    The controller is thread-safe, so one controller can be shared by several
+    sessions and threads.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = INITIAL_RATE,
+        min_rate: float = MIN_RATE,
+        max_rate: float = MAX_RATE,
+        rate_increase: float = RATE_INCREASE,
+        rate_decrease: float = RATE_DECREASE,
+        slow_latency_factor: float = SLOW_LATENCY_FACTOR,
+    ) -> None:
+        """Initializes the controller.
+
+        Args:
+            initial_rate (optional): The initial rate in requests per second.
+              Defaults to INITIAL_RATE.
+            min_rate (optional): The minimal rate. Defaults to MIN_RATE.
+            max_rate (optional): The maximal rate, i.e. the request budget.
+              Defaults to MAX_RATE.
+            rate_increase (optional): The rate is increased by this many
+              requests per second after each fast success. Defaults to
+              RATE_INCREASE.
+            rate_decrease (optional): The rate is multiplied by this factor when
+              the server is throttling or struggling. Defaults to RATE_DECREASE.
+            slow_latency_factor (optional): The server is slow if the smoothed
+              latency is this many times the baseline latency (and at least
+              SLOW_LATENCY_SLACK higher). Defaults to SLOW_LATENCY_FACTOR.
+        """
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_increase = rate_increase
+        self.rate_decrease = rate_decrease
+        self.slow_latency_factor = slow_latency_factor
+        self.throttled_rate = float("inf")
+        self.latency: float | None = None
+        self.baseline_latency: float | None = None
+        self._next_request = 0.0
+        self._last_decrease = -float("inf")
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Blocks until the next request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + 1 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def record_success(self, latency: float) -> None:
+        """Adapts the rate to a successful response.
+
+        Args:
+            latency: The latency of the response in seconds.
+        """
+        with self._lock:
+            # Smooth the latency, so that a single slow response does not count
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+            # The baseline is a minimum that drifts towards the recent latency
+            if self.baseline_latency is None or self.latency < self.baseline_latency:
+                self.baseline_latency = self.latency
+            else:
+                self.baseline_latency += BASELINE_DRIFT * (
+                    self.latency - self.baseline_latency
+                )
+            if self.latency > max(
+                self.slow_latency_factor * self.baseline_latency,
+                self.baseline_latency + SLOW_LATENCY_SLACK,
+            ):
+                self._decrease()
+            elif self.rate < 0.9 * self.throttled_rate:
+                self.rate = min(self.max_rate, self.rate + self.rate_increase)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.rate_increase / 50)
+
+    def record_failure(
+        self, throttled: bool = False, retry_after: float | None = None
+    ) -> None:
+        """Adapts the rate to a throttled or failed request.
+
+        Args:
+            throttled (optional): Whether the server throttled the request, i.e.
+              answered with 429. Defaults to False.
+            retry_after (optional): The seconds from the `Retry-After` header,
+              if there was one. Defaults to None.
+        """
+        with self._lock:
+            if throttled:
+                self.throttled_rate = self.rate
+            self._decrease()
+            if retry_after is not None:
+                self._next_request = max(
+                    self._next_request, time.monotonic() + retry_after
+                )
+
+    def _decrease(self) -> None:
+        """Decreases the rate multiplicatively, unless it was just decreased."""
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.rate_decrease)
+
+
+_controllers: dict[str, AdaptiveRateController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(host: str) -> AdaptiveRateController:
+    """Returns the rate controller shared by all sessions for a host.
+
+    Args:
+        host: The host, e.g. "www.lidl.de".
+
+    Returns:
+        The rate controller of the host.
+    """
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = AdaptiveRateController()
+        return _controllers[host]
+
+
+# **************** Session ****************
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parses a `Retry-After` header.
+
+    Args:
+        value: The header value, either seconds or an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if the value is missing or
+        malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(
+    attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP
+) -> float:
+    """Computes the jittered exponential backoff before a retry.
+
+    Args:
+        attempt: The number of the failed attempt, starting at 0.
+        base (optional): The delay after the first attempt. Defaults to
+          BACKOFF_BASE.
+        cap (optional): The maximal delay. Defaults to BACKOFF_CAP.
+
+    Returns:
+        A random delay between 0 and `min(cap, base * 2**attempt)` seconds.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class ThrottledSession(requests.Session):
+    """A session that throttles its requests and retries failed ones.
+
+    Requests are spaced by the rate controller of their host. Connection errors,
+    timeouts and the statuses in RETRY_STATUSES are retried with jittered
+    exponential backoff. If all retries fail, the last response is returned (so
+    that `raise_for_status` reports it) or the last exception is raised.
+    """
+
+    def __init__(
+        self,
+        controller: AdaptiveRateController | None = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+    ) -> None:
+        """Initializes the session.
+
+        Args:
+            controller (optional): The rate controller to use for all hosts.
+              Defaults to None, i.e. the shared controller of each host.
+            max_retries (optional): The number of retries. Defaults to
+              MAX_RETRIES.
+            backoff_base (optional): The backoff after the first failed attempt.
+              Defaults to BACKOFF_BASE.
+        """
+        super().__init__()
+        self.headers.update(HEADERS)
+        self.controller = controller
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    def request(
+        self, method: str | bytes, url: str | bytes, *args: Any, **kwargs: Any
+    ) -> requests.Response:  # type: ignore[override]
+        """Sends a throttled request and retries it on failure.
+
+        Args:
+            method: The HTTP method.
+            url: The URL.
+            *args: Passed on to `requests.Session.request`.
+            **kwargs: Passed on to `requests.Session.request`.
+
+        Returns:
+            The response.
+        """
+        host = ul.urlsplit(url if isinstance(url, str) else url.decode()).netloc
+        controller = self.controller or get_controller(host)
+
+        for attempt in range(self.max_retries + 1):
+            controller.wait()
+            start = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                controller.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Request to {url!r} failed ({e}), retrying.")
+                time.sleep(backoff_delay(attempt, self.backoff_base))
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                controller.record_success(time.monotonic() - start)
+                return response
+
+            retry_after = None
+            if response.status_code in RETRY_AFTER_STATUSES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            controller.record_failure(response.status_code == 429, retry_after)
+            if attempt == self.max_retries:
+                break
+            logging.warning(
+                f"Request to {url!r} returned {response.status_code}, retrying."
+            )
+            response.close()
+            # The controller already waits for Retry-After before the next request
+            time.sleep(backoff_delay(attempt, self.backoff_base))
+        return response
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+"""De-duplicates stores that were scraped more than once.
+
+Some stores appear multiple times in the extracted tables. For example, Aldi Sued
+lists a few stores under two different URLs, with slightly different coordinates.
+These duplicates inflate the number of stores and distort the distances.
+
+To find them without comparing all pairs of stores, the coordinates are bucketed
+into a grid (a simple spatial hash) whose cells are at least as large as the
+tolerance. Two stores can therefore only be duplicates if they lie in the same or
+in neighbouring cells. Stores that are within the tolerance *and* have the same
+normalized address are merged, keeping the first occurrence.
+"""
+
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rich import print
+
+# **************** Constants ****************
+
+PATH_TO_ALDI_SUED = Path("../../data/aldi_sued/aldi_sued.csv")
+PATH_TO_ALDI_NORD = Path("../../data/aldi_nord/aldi_nord.csv")
+PATH_TO_LIDL = Path("../../data/lidl/lidl.csv")
+PATH_TO_ALDI_SUED_DEDUPLICATED = Path("../../data/aldi_sued/aldi_sued_deduplicated.csv")
+PATH_TO_ALDI_NORD_DEDUPLICATED = Path("../../data/aldi_nord/aldi_nord_deduplicated.csv")
+PATH_TO_LIDL_DEDUPLICATED = Path("../../data/lidl/lidl_deduplicated.csv")
+PATH_TO_MERGE_REPORT = Path("../../data/deduplication_report.csv")
+
+TOLERANCE_METERS = 150.0
+EARTH_RADIUS_METERS = 6_371_008.8
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_METERS / 180
+
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+STREET_ABBREVIATION_RE = re.compile(r"str\.|str\b")
+NON_ALPHANUMERIC_RE = re.compile(r"[^a-z0-9]")
+
+# **************** Helpers ****************
+
+
+def normalize_address(street: str, postal_code: str) -> str:
+    """Normalizes an address so that spelling variants compare equal.
+
+    Umlauts are transliterated, "Str." is expanded to "strasse" and everything
+    that is not a letter or digit is dropped.
+
+    Args:
+        street: The street and house number.
+        postal_code: The postal code.
+
+    Returns:
+        The normalized address.
+    """
+    street = street.casefold().translate(UMLAUTS)
+    street = STREET_ABBREVIATION_RE.sub("strasse", street)
+    street = unicodedata.normalize("NFKD", street)
+    street = NON_ALPHANUMERIC_RE.sub("", street)
+    return f"{str(postal_code).strip().zfill(5)}|{street}"
+
+
+def haversine_meters(lat_1: float, lon_1: float, lat_2: float, lon_2: float) -> float:
+    """Computes the great-circle distance between two coordinates.
+
+    Args:
+        lat_1: The latitude of the first coordinate.
+        lon_1: The longitude of the first coordinate.
+        lat_2: The latitude of the second coordinate.
+        lon_2: The longitude of the second coordinate.
+
+    Returns:
+        The distance in meters.
+    """
+    phi_1, phi_2 = math.radians(lat_1), math.radians(lat_2)
+    d_phi = phi_2 - phi_1
+    d_lambda = math.radians(lon_2 - lon_1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi_1) * math.cos(phi_2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def haversine_meters_array(
+    lat: float, lon: float, lats: np.ndarray, lons: np.ndarray
+) -> np.ndarray:
+    """Computes the great-circle distances from one coordinate to many.
+
+    Args:
+        lat: The latitude of the coordinate.
+        lon: The longitude of the coordinate.
+        lats: The latitudes of the other coordinates.
+        lons: The longitudes of the other coordinates.
+
+    Returns:
+        The distances in meters.
+    """
+    phi, phis = np.radians(lat), np.radians(lats)
+    a = (
+        np.sin((phis - phi) / 2) ** 2
+        + np.cos(phi) * np.cos(phis) * np.sin(np.radians(lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def find_duplicate_pairs(
+    df: pd.DataFrame, tolerance: float = TOLERANCE_METERS
+) -> list[tuple[int, int, float]]:
+    """Finds pairs of stores that are within the tolerance of each other.
+
+    The longitude cell size is derived from the northernmost store, so that a
+    cell is at least `tolerance` meters wide everywhere. This guarantees that
+    every pair within the tolerance ends up in the same or in adjacent cells.
+
+    Args:
+        df: The stores, with "Latitude" and "Longitude" columns.
+        tolerance (optional): The maximal distance in meters between two
+          duplicates. Defaults to TOLERANCE_METERS.
+
+    Returns:
+        A list of tuples `(i, j, distance)` with positional indices `i < j` and
+        the distance in meters.
+    """
+    latitudes = df["Latitude"].astype(float).tolist()
+    longitudes = df["Longitude"].astype(float).tolist()
+    if not latitudes:
+        return []
+
+    max_abs_lat = min(max(abs(lat) for lat in latitudes), 89.0)
+    lat_cell = tolerance / METERS_PER_DEGREE_LAT
+    lon_cell = lat_cell / math.cos(math.radians(max_abs_lat))
+
+    grid: dict[tuple[int, int], list[int]] = defaultdict(list)
+    pairs: list[tuple[int, int, float]] = []
+    for j, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+        cell_x, cell_y = math.floor(lat / lat_cell), math.floor(lon / lon_cell)
+        # Only stores seen before are in the grid, so every pair is found once
+        for d_x in (-1, 0, 1):
+            for d_y in (-1, 0, 1):
+                for i in grid.get((cell_x + d_x, cell_y + d_y), ()):
+                    dist = haversine_meters(latitudes[i], longitudes[i], lat, lon)
+                    if dist <= tolerance:
+                        pairs.append((i, j, dist))
+        grid[(cell_x, cell_y)].append(j)
+    return pairs
+
+
+def deduplicate_stores(
+    df: pd.DataFrame,
+    chain: str,
+    tolerance: float = TOLERANCE_METERS,
+) -> tuple[pd.DataFrame, list[dict[str, str | float]]]:
+    """Merges stores that are close to each other and share an address.
+
+    Clusters of duplicates are built with a union-find, so chains of duplicates
+    collapse into the first store of the cluster.
+
+    Args:
+        df: The stores of one chain.
+        chain: The name of the chain, used in the report.
+        tolerance (optional): The maximal distance in meters between two
+          duplicates. Defaults to TOLERANCE_METERS.
+
+    Returns:
+        A tuple of the de-duplicated stores and the merge report. The report
+        contains one dictionary per removed store.
+    """
+    df = df.reset_index(drop=True)
+    postal_code_column = "Postal Code" if "Postal Code" in df else "Postalcode"
+    addresses = [
+        normalize_address(str(street), str(postal_code))
+        for street, postal_code in zip(df["Street"], df[postal_code_column])
+    ]
+
+    parent = list(range(len(df)))
+
+    def find(i: int) -> int:
+        """Finds the representative of a cluster."""
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    distances: dict[int, float] = {}
+    for i, j, dist in find_duplicate_pairs(df, tolerance):
+        if addresses[i] != addresses[j]:
+            continue
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            # Keep the smaller index, i.e. the first occurrence
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+            distances[max(root_i, root_j)] = dist
+
+    report: list[dict[str, str | float]] = []
+    keep: list[bool] = []
+    for i in range(len(df)):
+        root = find(i)
+        keep.append(root == i)
+        if root != i:
+            report.append(
+                {
+                    "Chain": chain,
+                    "Kept Index": root,
+                    "Removed Index": i,
+                    "Kept Street": str(df.at[root, "Street"]),
+                    "Removed Street": str(df.at[i, "Street"]),
+                    "Distance": distances.get(i, 0.0),
+                }
+            )
+    return df[keep].reset_index(drop=True), report
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    chains = [
+        ("Aldi Sued", PATH_TO_ALDI_SUED, PATH_TO_ALDI_SUED_DEDUPLICATED),
+        ("Aldi Nord", PATH_TO_ALDI_NORD, PATH_TO_ALDI_NORD_DEDUPLICATED),
+        ("Lidl", PATH_TO_LIDL, PATH_TO_LIDL_DEDUPLICATED),
+    ]
+    full_report: list[dict[str, str | float]] = []
+    for chain, path, path_to_save in chains:
+        df = pd.read_csv(path)
+        deduplicated_df, report = deduplicate_stores(df, chain)
+        deduplicated_df.to_csv(path_to_save, index=False)
+        deduplicated_df.to_parquet(path_to_save.with_suffix(".parquet"))
+        full_report += report
+        print(f"{chain}: merged {len(report)} of {len(df)} stores.")
+
+    pd.DataFrame(
+        full_report,
+        columns=[
+            "Chain",
+            "Kept Index",
+            "Removed Index",
+            "Kept Street",
+            "Removed Street",
+            "Distance",
+        ],
+    ).to_csv(PATH_TO_MERGE_REPORT, index=False)
+    print(f"Saved the merge report to {PATH_TO_MERGE_REPORT}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Load test for the nearest-store server.
+
+Start `nearest_store_server.py` first. This script then opens a number of
+keep-alive connections, sends random coordinates within Germany and reports the
+p50/p99 latency and the throughput, both for single and for batched queries.
+"""
+
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from rich import print
+
+# **************** Constants ****************
+
+HOST = "127.0.0.1"
+PORT = 8765
+CONNECTIONS = 4
+REQUESTS_PER_CONNECTION = 2_000
+BATCH_SIZE = 100
+BATCH_REQUESTS_PER_CONNECTION = 100
+
+# Rough bounding box of Germany
+LAT_RANGE = (47.3, 55.0)
+LON_RANGE = (5.9, 15.0)
+
+# **************** Helpers ****************
+
+
+def random_coordinates(n: int) -> list[tuple[float, float]]:
+    """Draws random coordinates within the bounding box of Germany.
+
+    Args:
+        n: The number of coordinates.
+
+    Returns:
+        A list of (latitude, longitude) tuples.
+    """
+    return [(random.uniform(*LAT_RANGE), random.uniform(*LON_RANGE)) for _ in range(n)]
+
+
+def build_request(batch_size: int) -> bytes:
+    """Builds a single (GET) or batched (POST) nearest-store request.
+
+    Args:
+        batch_size: The number of coordinates; 1 sends a single GET query.
+
+    Returns:
+        The raw HTTP request.
+    """
+    if batch_size == 1:
+        ((lat, lon),) = random_coordinates(1)
+        return f"GET /nearest?chain=lidl&lat={lat}&lon={lon} HTTP/1.1\r\n\r\n".encode()
+    body = json.dumps({"chain": "lidl", "coordinates": random_coordinates(batch_size)})
+    return (
+        f"POST /nearest HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n{body}"
+    ).encode()
+
+
+async def run_connection(n_requests: int, batch_size: int) -> list[float]:
+    """Sends requests over one connection and measures their latencies.
+
+    Args:
+        n_requests: The number of requests to send.
+        batch_size: The number of coordinates per request.
+
+    Returns:
+        The latency of each request in seconds.
+
+    Raises:
+        RuntimeError: If the server does not answer with status 200.
+    """
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    latencies: list[float] = []
+    for _ in range(n_requests):
+        request = build_request(batch_size)
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        content_length = 0
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value)
+        await reader.readexactly(content_length)
+        latencies.append(time.perf_counter() - start)
+        if b" 200 " not in status_line:
+            raise RuntimeError(f"Unexpected response: {status_line!r}")
+    writer.close()
+    await writer.wait_closed()
+    return latencies
+
+
+async def load_test(batch_size: int, n_requests: int) -> None:
+    """Runs the load test and prints the latency statistics.
+
+    Args:
+        batch_size: The number of coordinates per request.
+        n_requests: The number of requests per connection.
+    """
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(run_connection(n_requests, batch_size) for _ in range(CONNECTIONS))
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for result in results for latency in result]
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"[bold]Batch size {batch_size}[/bold] ({len(latencies)} requests)")
+    print(f"  p50 latency: {percentiles[49] * 1000:.3f} ms")
+    print(f"  p99 latency: {percentiles[98] * 1000:.3f} ms")
+    print(f"  QPS: {len(latencies) / elapsed:.1f} requests/s")
+    print(f"  Coordinates/s: {len(latencies) * batch_size / elapsed:.1f}")
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    asyncio.run(load_test(1, REQUESTS_PER_CONNECTION))
+    asyncio.run(load_test(BATCH_SIZE, BATCH_REQUESTS_PER_CONNECTION))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,131 @@
 #!/usr/bin/env python
-"""Code to compute the minimum distances between all Aldi-Lidl pairs."""
+"""Code to compute the minimum distances between all Aldi-Lidl pairs.
+
+The coordinates are read from the store table as arrays. For each Aldi, the
+great-circle distances to all Lidls are computed at once with numpy. Only the
+Lidls that are within CANDIDATE_FACTOR of the nearest great-circle distance can
+be the nearest on the ellipsoid, so the exact geodesic distance is only computed
+for those.
+"""
 
 import statistics
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from geopy.distance import geodesic
 from rich import print
 from tqdm import tqdm
 
+from deduplicate_stores import haversine_meters_array
+from store_table import StoreTable
+
 # **************** Constants ****************
 
-PATH_TO_ALDI_SUED = Path("../../data/aldi_sued/aldi_sued.csv")
-PATH_TO_ALDI_NORD = Path("../../data/aldi_nord/aldi_nord.csv")
-PATH_TO_LIDL = Path("../../data/lidl/lidl.csv")
-PATH_TO_MIN_DISTANCES = Path("../../data/min_distances.txt")
+PATH_TO_STORE_TABLE = Path("../../data/stores.bin")
+PATH_TO_MIN_DISTANCES = Path("../../data/min_distances.csv")
+
+# The geodesic and the great-circle distance differ by less than 0.5%
+CANDIDATE_FACTOR = 1.02
 
 # **************** Helpers ****************
 
 
 def read_and_concat_aldi_coords(
-    aldi_sued_path: Path = PATH_TO_ALDI_SUED, aldi_nord_path: Path = PATH_TO_ALDI_NORD
-) -> list[tuple[float, float]]:
+    store_table_path: Path = PATH_TO_STORE_TABLE,
+) -> tuple[np.ndarray, np.ndarray]:
     """Reads and concatenates Aldi Sued and Nord coordinates.
 
     Args:
-        aldi_sued_path (optional): The path to the Aldi Sued addresses. Defaults
-          to PATH_TO_ALDI_SUED.
-        aldi_nord_path (optional): The path to the Aldi Nord addresses. Defaults
-          to PATH_TO_ALDI_NORD.
+        store_table_path (optional): The path to the store table. Defaults to
+          PATH_TO_STORE_TABLE.
+
+    Returns:
+        A tuple of the latitude and the longitude arrays.
+    """
+    return StoreTable.load(store_table_path).coordinates(["aldi_sued", "aldi_nord"])
+
+
+def read_aldi_keys(store_table_path: Path = PATH_TO_STORE_TABLE) -> pd.DataFrame:
+    """Reads the keys of the Aldi Sued and Nord stores.
+
+    Args:
+        store_table_path (optional): The path to the store table. Defaults to
+          PATH_TO_STORE_TABLE.
 
     Returns:
-        A list of tuples, where each tuple contains the latitude and longitude
-        coordinates as floats.
+        A DataFrame with the columns "Chain" and "Store ID", in the same order
+        as the coordinates of `read_and_concat_aldi_coords`.
     """
-    aldi_coordinates: list[tuple[float, float]] = []
-    # Aldi sued coordinates
-    aldi_sued_df = pd.read_csv(aldi_sued_path)
-    aldi_sued_coordinates = [
-        (float(row["Latitude"]), float(row["Longitude"]))
-        for _, row in aldi_sued_df.iterrows()
-    ]
-    # Aldi nord coordinates
-    aldi_nord_df = pd.read_csv(aldi_nord_path)
-    aldi_nord_coordinates = [
-        (float(row["Latitude"]), float(row["Longitude"]))
-        for _, row in aldi_nord_df.iterrows()
-    ]
-    aldi_coordinates = aldi_sued_coordinates + aldi_nord_coordinates
-    return aldi_coordinates
-
-
-def read_lidl_coords(filepath: Path = PATH_TO_LIDL) -> list[tuple[float, float]]:
+    stores = StoreTable.load(store_table_path).to_dataframe(["aldi_sued", "aldi_nord"])
+    return stores[["Chain", "Store ID"]]
+
+
+def read_lidl_coords(
+    store_table_path: Path = PATH_TO_STORE_TABLE,
+) -> tuple[np.ndarray, np.ndarray]:
     """Read the lidl coordinates.
 
     Args:
-        filepath (optional): The path to the Lidl addresses. Defaults to
-          PATH_TO_LIDL.
+        store_table_path (optional): The path to the store table. Defaults to
+          PATH_TO_STORE_TABLE.
 
     Returns:
-        A list of tuples where each tuple contains the latitude and longitude
-        coordinates for a Lidl store.
+        A tuple of the latitude and the longitude arrays of the Lidl stores.
     """
-    lidl_df = pd.read_csv(filepath)
-    lidl_coordinates = [
-        (float(row["Latitude"]), float(row["Longitude"]))
-        for _, row in lidl_df.iterrows()
-    ]
-    return lidl_coordinates
+    return StoreTable.load(store_table_path).coordinates(["lidl"])
 
 
 def calculate_min_distances(
-    aldi_coords: list[tuple[float, float]], lidl_coords: list[tuple[float, float]]
-) -> list[float]:
+    aldi_coords: tuple[np.ndarray, np.ndarray],
+    lidl_coords: tuple[np.ndarray, np.ndarray],
+) -> np.ndarray:
     """Calculates the distance for all Aldis to the nearest Lidl.
 
     Args:
-        aldi_coords: The coordinates of Aldi stores.
-        lidl_coords: The coordinates of Lidl stores.
+        aldi_coords: The latitudes and longitudes of the Aldi stores.
+        lidl_coords: The latitudes and longitudes of the Lidl stores.
 
     Returns:
-        A list containing the distance, in meters, to the nearest Lidl store for
-        each Aldi store. Both Aldi nord and Aldi sued store.
+        An array containing the distance, in meters, to the nearest Lidl store
+        for each Aldi store. Both Aldi nord and Aldi sued store.
     """
-    min_distances: list[float] = []
-    for aldi in tqdm(aldi_coords, desc="computing distances for Aldis"):
-        distances: list[float] = []
-        for lidl in lidl_coords:
-            dist = geodesic(aldi, lidl).meters
-            distances.append(dist)
-        # check the minimal one and append it to global list
-        min_distances.append(min(distances))
+    lidl_lats, lidl_lons = lidl_coords
+    aldi_lats, aldi_lons = aldi_coords
+    min_distances = np.empty(len(aldi_lats))
+    for i, (lat, lon) in enumerate(
+        tqdm(
+            zip(aldi_lats.tolist(), aldi_lons.tolist()),
+            total=len(aldi_lats),
+            desc="computing distances for Aldis",
+        )
+    ):
+        distances = haversine_meters_array(lat, lon, lidl_lats, lidl_lons)
+        candidates = np.flatnonzero(distances <= CANDIDATE_FACTOR * distances.min())
+        min_distances[i] = min(
+            geodesic((lat, lon), (lidl_lats[j], lidl_lons[j])).meters
+            for j in candidates.tolist()
+        )
     return min_distances
 
 
 def save_min_distances(
-    min_distances: list[float], path_to_save: Path = PATH_TO_MIN_DISTANCES
+    keys: pd.DataFrame,
+    min_distances: np.ndarray,
+    path_to_save: Path = PATH_TO_MIN_DISTANCES,
 ) -> None:
-    """Saves the minimum distances to a file.
+    """Saves the minimum distances to a CSV file.
 
-    Each distance is saved in a new line in a txt file.
+    Each distance is saved together with the key of its Aldi store, so that it
+    can be joined back to the store (see `regional_statistics.py`).
 
     Args:
-        min_distances: The list of minimum distances (in meters) for all Aldi
-          stores.
+        keys: The chain and store id of each Aldi store, see `read_aldi_keys`.
+        min_distances: The minimum distances (in meters) for all Aldi stores.
         path_to_save (optional): The filepath where the distances should be
           saved. Defaults to PATH_TO_MIN_DISTANCES.
     """
-    with open(path_to_save, "w", encoding="utf-8") as file:
-        file.writelines("\n".join(str(distance) for distance in min_distances))
+    keys.assign(Distance=min_distances).to_csv(path_to_save, index=False)
 
 
 # **************** Main ****************
@@ -122,8 +139,8 @@ def main() -> None:
     lidl_coordinates = read_lidl_coords()
     # compute the minimum distances
     minimum_distances = calculate_min_distances(aldi_coordinates, lidl_coordinates)
-    # save them to a file
-    save_min_distances(minimum_distances)
+    # save them to a file, keyed by store
+    save_min_distances(read_aldi_keys(), minimum_distances)
     print(
         f"The maximal distance between any Aldi and a Lidl in Germany is at most {max(minimum_distances)} meters."
     )
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""A local HTTP server that answers nearest-store queries.
+
+The store table (see `store_table.py`) is loaded once at startup and indexed in
+a grid (see `deduplicate_stores.py`), so that a query only looks at the stores in
+the cells around the given coordinates. The store table file is watched and the
+index is rebuilt in the background whenever it changes.
+
+Endpoints:
+```
+GET  /nearest?chain=lidl&lat=52.52&lon=13.40
+POST /nearest  {"chain": "aldi", "coordinates": [[52.52, 13.40], ...]}
+GET  /health
+```
+The chain is one of `lidl`, `aldi`, `aldi_sued` or `aldi_nord`.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+import urllib.parse as ul
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from deduplicate_stores import METERS_PER_DEGREE_LAT, haversine_meters_array
+from store_table import StoreTable
+
+# **************** Constants ****************
+
+PATH_TO_STORE_TABLE = Path("../../data/stores.bin")
+
+# Query name -> chains in the store table
+CHAINS = {
+    "lidl": ["lidl"],
+    "aldi": ["aldi_sued", "aldi_nord"],
+    "aldi_sued": ["aldi_sued"],
+    "aldi_nord": ["aldi_nord"],
+}
+
+HOST = "127.0.0.1"
+PORT = 8765
+CELL_SIZE_DEGREES = 0.2
+RELOAD_INTERVAL_SECONDS = 2.0
+MAX_BATCH_SIZE = 10_000
+
+# **************** Spatial index ****************
+
+
+class StoreIndex:
+    """A grid index over the stores of one chain for nearest-neighbour queries.
+
+    The index only holds the row positions of the stores in the (memory-mapped)
+    store table; the coordinates are read from the table's arrays and a store is
+    only decoded when it is returned.
+
+    Cells are `cell_size` degrees high and, like in `deduplicate_stores.py`,
+    widened in longitude so that they are at least as wide as high at the
+    northernmost store. A query searches rings of cells around its own cell
+    until no unsearched cell can contain a closer store.
+    """
+
+    def __init__(
+        self,
+        table: StoreTable,
+        chains: list[str],
+        cell_size: float = CELL_SIZE_DEGREES,
+    ) -> None:
+        """Builds the index.
+
+        Args:
+            table: The store table.
+            chains: The chains of the store table to index.
+            cell_size (optional): The height of a cell in degrees. Defaults to
+              CELL_SIZE_DEGREES.
+        """
+        self.table = table
+        self.rows = table.rows(chains)
+        latitudes = table.latitude[self.rows]
+        longitudes = table.longitude[self.rows]
+        self.max_abs_lat = min(float(np.abs(latitudes).max(initial=0)), 89)
+        self.lat_cell = cell_size
+        self.lon_cell = cell_size / math.cos(math.radians(self.max_abs_lat))
+
+        # Sort the rows by cell, each cell is then a slice of the sorted rows
+        xs = np.floor(latitudes / self.lat_cell).astype(np.int64)
+        ys = np.floor(longitudes / self.lon_cell).astype(np.int64)
+        order = np.lexsort((ys, xs))
+        xs, ys = xs[order], ys[order]
+        starts = np.flatnonzero(
+            np.concatenate(([True], (np.diff(xs) != 0) | (np.diff(ys) != 0)))
+        )
+        self.grid: dict[tuple[int, int], np.ndarray] = {
+            (int(xs[start]), int(ys[start])): rows
+            for start, rows in zip(
+                starts.tolist(), np.split(self.rows[order], starts[1:])
+            )
+        }
+        self.x_range = (int(xs.min(initial=0)), int(xs.max(initial=0)))
+        self.y_range = (int(ys.min(initial=0)), int(ys.max(initial=0)))
+
+    def __len__(self) -> int:
+        """Returns the number of stores in the index."""
+        return len(self.rows)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        """Returns the grid cell of a coordinate."""
+        return math.floor(lat / self.lat_cell), math.floor(lon / self.lon_cell)
+
+    def _ring(self, x: int, y: int, r: int) -> list[tuple[int, int]]:
+        """Returns the cells at Chebyshev distance `r` around a cell."""
+        if r == 0:
+            return [(x, y)]
+        top_and_bottom = [(x + d, y + s) for d in range(-r, r + 1) for s in (-r, r)]
+        sides = [(x + s, y + d) for d in range(-r + 1, r) for s in (-r, r)]
+        return top_and_bottom + sides
+
+    def _closest(self, lat: float, lon: float, rows: np.ndarray) -> tuple[int, float]:
+        """Returns the closest of the given rows and its distance in meters."""
+        distances = haversine_meters_array(
+            lat, lon, self.table.latitude[rows], self.table.longitude[rows]
+        )
+        i = int(distances.argmin())
+        return int(rows[i]), float(distances[i])
+
+    def nearest(self, lat: float, lon: float) -> tuple[int, float]:
+        """Finds the nearest store.
+
+        Args:
+            lat: The latitude of the query.
+            lon: The longitude of the query.
+
+        Returns:
+            A tuple of the row of the nearest store in the store table and its
+            distance in meters.
+
+        Raises:
+            ValueError: If the index is empty.
+        """
+        if not len(self.rows):
+            raise ValueError("The index does not contain any stores.")
+        x, y = self._cell(lat, lon)
+        if not (
+            self.x_range[0] <= x <= self.x_range[1]
+            and self.y_range[0] <= y <= self.y_range[1]
+        ):
+            # Far outside the grid, most rings would be empty, so comparing all
+            # stores is faster than searching ring by ring
+            return self._closest(lat, lon, self.rows)
+        # Beyond this ring all occupied cells have been searched
+        max_ring = max(
+            abs(x - self.x_range[0]),
+            abs(x - self.x_range[1]),
+            abs(y - self.y_range[0]),
+            abs(y - self.y_range[1]),
+        )
+        best_row, best_dist = -1, math.inf
+        r = 0
+        while r <= max_ring:
+            cells = [
+                self.grid[cell] for cell in self._ring(x, y, r) if cell in self.grid
+            ]
+            if cells:
+                row, dist = self._closest(lat, lon, np.concatenate(cells))
+                if dist < best_dist:
+                    best_row, best_dist = row, dist
+            # Every store in ring r + 1 is at least r cell widths away; the
+            # width is taken at the farthest latitude such a cell can reach
+            far_lat = min(max(abs(lat), self.max_abs_lat) + (r + 2) * self.lat_cell, 89)
+            cell_width = METERS_PER_DEGREE_LAT * min(
+                self.lat_cell, self.lon_cell * math.cos(math.radians(far_lat))
+            )
+            if best_dist <= r * cell_width:
+                break
+            r += 1
+        return best_row, best_dist
+
+
+def build_indices(path: Path = PATH_TO_STORE_TABLE) -> dict[str, StoreIndex]:
+    """Builds the index for every chain.
+
+    All indices share the same memory-mapped store table.
+
+    Args:
+        path (optional): The path to the store table. Defaults to
+          PATH_TO_STORE_TABLE.
+
+    Returns:
+        A dictionary mapping the chain names to their indices.
+    """
+    table = StoreTable.load(path)
+    return {chain: StoreIndex(table, chains) for chain, chains in CHAINS.items()}
+
+
+def parse_coordinate(lat: Any, lon: Any) -> tuple[float, float]:
+    """Parses and validates a coordinate of a query.
+
+    Args:
+        lat: The latitude.
+        lon: The longitude.
+
+    Returns:
+        The coordinate as a (latitude, longitude) tuple of floats.
+
+    Raises:
+        ValueError: If a value is not a number, not finite or out of range.
+    """
+    lat, lon = float(lat), float(lon)
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError(f"Coordinates must be finite: {lat}, {lon}")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"Coordinates out of range: {lat}, {lon}")
+    return lat, lon
+
+
+# **************** Server ****************
+
+
+class NearestStoreServer:
+    """Serves nearest-store queries and hot-reloads the index."""
+
+    def __init__(self) -> None:
+        """Loads the store tables and builds the indices."""
+        self.indices = build_indices()
+        self.mtimes = self._current_mtimes()
+        self.loaded_at = time.time()
+
+    def _current_mtimes(self) -> dict[Path, int]:
+        """Returns the modification time of the store table."""
+        return {PATH_TO_STORE_TABLE: PATH_TO_STORE_TABLE.stat().st_mtime_ns}
+
+    async def watch_files(self) -> None:
+        """Rebuilds the indices whenever the store table changes.
+
+        The new indices are built in a thread and swapped in at once, so that
+        queries keep being answered from the old index in the meantime.
+        """
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL_SECONDS)
+            try:
+                mtimes = self._current_mtimes()
+                if mtimes == self.mtimes:
+                    continue
+                indices = await asyncio.to_thread(build_indices)
+            except Exception as e:
+                logging.warning(f"Could not reload the store tables: {e}")
+                continue
+            self.indices, self.mtimes, self.loaded_at = indices, mtimes, time.time()
+            logging.info("Reloaded the store tables.")
+
+    def query(self, chain: str, coordinates: list[tuple[float, float]]) -> list[Any]:
+        """Answers a nearest-store query for a list of coordinates.
+
+        Args:
+            chain: The name of the chain.
+            coordinates: The coordinates as (latitude, longitude) tuples.
+
+        Returns:
+            One result dictionary per coordinate.
+
+        Raises:
+            KeyError: If the chain is unknown.
+        """
+        index = self.indices[chain]
+        results = []
+        for lat, lon in coordinates:
+            row, dist = index.nearest(lat, lon)
+            results.append({"store": index.table.store(row), "distance": dist})
+        return results
+
+    def route(self, method: str, target: str, body: bytes) -> tuple[int, Any]:
+        """Dispatches a request to the matching endpoint.
+
+        Args:
+            method: The HTTP method.
+            target: The request target, i.e. path and query string.
+            body: The request body.
+
+        Returns:
+            A tuple of the HTTP status code and the JSON payload.
+        """
+        url = ul.urlsplit(target)
+        if url.path == "/health" and method == "GET":
+            return 200, {
+                "loaded_at": self.loaded_at,
+                "stores": {chain: len(index) for chain, index in self.indices.items()},
+            }
+        if url.path != "/nearest":
+            return 404, {"error": f"Unknown path: {url.path}"}
+
+        try:
+            if method == "GET":
+                params = dict(ul.parse_qsl(url.query))
+                chain = params.get("chain", "lidl")
+                coordinates = [parse_coordinate(params["lat"], params["lon"])]
+            elif method == "POST":
+                payload = json.loads(body)
+                if not isinstance(payload, dict):
+                    raise TypeError("The body must be a JSON object.")
+                chain = payload.get("chain", "lidl")
+                # Checked before parsing, so an oversized batch is rejected cheaply
+                if len(payload["coordinates"]) > MAX_BATCH_SIZE:
+                    return 400, {"error": f"At most {MAX_BATCH_SIZE} coordinates."}
+                coordinates = [
+                    parse_coordinate(lat, lon) for lat, lon in payload["coordinates"]
+                ]
+            else:
+                return 405, {"error": f"Method not allowed: {method}"}
+            if not isinstance(chain, str):
+                raise TypeError("The chain must be a string.")
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            return 400, {"error": f"Malformed request: {e}"}
+
+        if chain not in self.indices:
+            return 404, {"error": f"Unknown chain: {chain}"}
+        results = self.query(chain, coordinates)
+        if method == "GET":
+            return 200, {"chain": chain, **results[0]}
+        return 200, {"chain": chain, "results": results}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Handles the (keep-alive) HTTP requests of one connection.
+
+        Args:
+            reader: The stream to read the requests from.
+            writer: The stream to write the responses to.
+        """
+        try:
+            while request_line := await reader.readline():
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = self.route(method, target, body)
+                content = json.dumps(payload, default=str).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n\r\n".encode()
+                    + content
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            logging.debug(f"Dropped connection: {e}")
+        finally:
+            writer.close()
+
+
+async def serve(host: str = HOST, port: int = PORT) -> None:
+    """Starts the server and serves forever.
+
+    Args:
+        host (optional): The host to bind to. Defaults to HOST.
+        port (optional): The port to bind to. Defaults to PORT.
+    """
+    server = NearestStoreServer()
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port)
+    logging.info(f"Serving nearest-store queries on http://{host}:{port}.")
+    async with tcp_server:
+        await asyncio.gather(tcp_server.serve_forever(), server.watch_files())
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(levelname)s: %(message)s",
+    )
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
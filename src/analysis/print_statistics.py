@@ -4,17 +4,18 @@
 These are from any Aldi store to the nearest Lidl store.
 """
 
+import csv
 import statistics
 from pathlib import Path
 from rich import print
 
-PATH_TO_MIN_DISTANCES = Path("../../data/min_distances.txt")
+PATH_TO_MIN_DISTANCES = Path("../../data/min_distances.csv")
 
 
 def main() -> None:
     """Runs the code."""
     with open(PATH_TO_MIN_DISTANCES, "r", encoding="utf-8") as file:
-        distances = [float(line.strip()) for line in file.readlines()]
+        distances = [float(row["Distance"]) for row in csv.DictReader(file)]
 
     # Calculate the stats
     min_ = min(distances)
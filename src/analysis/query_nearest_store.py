@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Queries the nearest store from a running `nearest_store_server.py`.
+
+Only the standard library and rich are imported, so that a query from the
+command line does not pay for importing pandas.
+
+Example:
+```
+python query_nearest_store.py --chain aldi 52.52,13.40 48.14,11.58
+```
+"""
+
+import argparse
+import http.client
+import json
+import urllib.parse as ul
+from typing import Any
+
+from rich import print
+
+# **************** Constants ****************
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# **************** Helpers ****************
+
+
+def query_nearest(
+    coordinates: list[tuple[float, float]],
+    chain: str = "lidl",
+    host: str = HOST,
+    port: int = PORT,
+) -> list[dict[str, Any]]:
+    """Queries the nearest store for each coordinate.
+
+    A single coordinate is sent as a GET request, multiple ones as one batched
+    POST request.
+
+    Args:
+        coordinates: The coordinates as (latitude, longitude) tuples.
+        chain (optional): The chain to search. Defaults to "lidl".
+        host (optional): The host of the server. Defaults to HOST.
+        port (optional): The port of the server. Defaults to PORT.
+
+    Returns:
+        One result dictionary, with the store and the distance, per coordinate.
+
+    Raises:
+        RuntimeError: If the server answers with an error.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    if len(coordinates) == 1:
+        ((lat, lon),) = coordinates
+        query = ul.urlencode({"chain": chain, "lat": lat, "lon": lon})
+        connection.request("GET", f"/nearest?{query}")
+    else:
+        body = json.dumps({"chain": chain, "coordinates": coordinates})
+        connection.request("POST", "/nearest", body=body)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+
+    if response.status != 200:
+        raise RuntimeError(payload.get("error", f"Status {response.status}"))
+    if len(coordinates) == 1:
+        return [{"store": payload["store"], "distance": payload["distance"]}]
+    return payload["results"]
+
+
+def parse_coordinate(text: str) -> tuple[float, float]:
+    """Parses a coordinate of the form "lat,lon".
+
+    Args:
+        text: The coordinate.
+
+    Returns:
+        The (latitude, longitude) tuple.
+
+    Raises:
+        argparse.ArgumentTypeError: If the coordinate is malformed.
+    """
+    try:
+        lat, lon = text.split(",")
+        return float(lat), float(lon)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected 'lat,lon', got: {text}")
+
+
+# **************** Main ****************
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Runs the code.
+
+    Args:
+        argv (optional): The command line arguments. Defaults to `sys.argv`.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("coordinates", nargs="+", type=parse_coordinate)
+    parser.add_argument(
+        "--chain",
+        default="lidl",
+        choices=["lidl", "aldi", "aldi_sued", "aldi_nord"],
+    )
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+
+    results = query_nearest(args.coordinates, args.chain, args.host, args.port)
+    for (lat, lon), result in zip(args.coordinates, results):
+        store = result["store"]
+        print(
+            f"({lat}, {lon}): {store['Street']}, {store['City']} "
+            f"at {result['distance']:.1f} meters"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Computes the distance statistics per postal code region and per city.
+
+The minimum distances in `min_distances.csv` are keyed by the chain and the store
+id of their Aldi store (see `min_distances.py`). They are joined back to the
+stores on that key, so that every distance has its postal code and city again.
+The statistics are computed with a vectorized group-by per 1-digit postal code
+region (the "Leitzone"), per 2-digit region and per city.
+
+The per-store distances are also written as Hive-partitioned Parquet
+(`plz1=0/plz2=01/...`), so that queries for a region only read its partitions.
+When reading, pyarrow infers the partition values as integers, e.g.
+`pd.read_parquet(path, filters=[("plz2", "=", 1)])` reads only the region 01.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+from rich import print
+
+from store_table import StoreTable
+
+# **************** Constants ****************
+
+PATH_TO_STORE_TABLE = Path("../../data/stores.bin")
+PATH_TO_MIN_DISTANCES = Path("../../data/min_distances.csv")
+PATH_TO_REGIONS = Path("../../data/regions")
+PATH_TO_STORE_DISTANCES = PATH_TO_REGIONS / "store_distances"
+
+QUANTILES = {"q25": 0.25, "median": 0.5, "q75": 0.75, "q90": 0.9}
+
+# **************** Helpers ****************
+
+
+def join_distances(
+    store_table_path: Path = PATH_TO_STORE_TABLE,
+    min_distances_path: Path = PATH_TO_MIN_DISTANCES,
+) -> pd.DataFrame:
+    """Joins the minimum distances back to the Aldi stores.
+
+    Args:
+        store_table_path (optional): The path to the store table. Defaults to
+          PATH_TO_STORE_TABLE.
+        min_distances_path (optional): The path to the minimum distances.
+          Defaults to PATH_TO_MIN_DISTANCES.
+
+    Returns:
+        The Aldi stores with the additional columns "Distance", "plz1" and
+        "plz2".
+
+    Raises:
+        ValueError: If a store has no distance or a distance has no store, i.e.
+          the distances were computed from another version of the store table.
+    """
+    stores = StoreTable.load(store_table_path).to_dataframe(["aldi_sued", "aldi_nord"])
+    distances = pd.read_csv(
+        min_distances_path, dtype={"Store ID": str}, float_precision="round_trip"
+    )
+    df = stores.merge(
+        distances,
+        on=["Chain", "Store ID"],
+        how="outer",
+        validate="one_to_one",
+        indicator=True,
+    )
+    unmatched = df["_merge"] != "both"
+    if unmatched.any():
+        raise ValueError(
+            f"{unmatched.sum()} stores and distances do not match, e.g. "
+            f"{df.loc[unmatched, 'Store ID'].iloc[0]!r}. "
+            "Recompute the distances with min_distances.py."
+        )
+    return df.drop(columns="_merge").assign(
+        plz1=df["Postal Code"].str[:1],
+        plz2=df["Postal Code"].str[:2],
+    )
+
+
+def aggregate_distances(df: pd.DataFrame, by: str | list[str]) -> pd.DataFrame:
+    """Computes the distance statistics per group.
+
+    Args:
+        df: The stores with their distances.
+        by: The column(s) to group by.
+
+    Returns:
+        A DataFrame with one row per group and the columns "count", "min",
+        "max", "mean" and the QUANTILES.
+    """
+    grouped = df.groupby(by)["Distance"]
+    statistics = grouped.agg(["count", "min", "max", "mean"])
+    quantiles = grouped.quantile(list(QUANTILES.values())).unstack()
+    quantiles.columns = list(QUANTILES)
+    return statistics.join(quantiles).reset_index()
+
+
+def save_partitioned(df: pd.DataFrame, path: Path = PATH_TO_STORE_DISTANCES) -> None:
+    """Saves the per-store distances as Parquet partitioned by region.
+
+    The existing partitions are removed first, because pyarrow adds new files
+    next to the existing ones instead of replacing them.
+
+    Args:
+        df: The stores with their distances.
+        path (optional): The root directory of the partitions. Defaults to
+          PATH_TO_STORE_DISTANCES.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    df.to_parquet(path, partition_cols=["plz1", "plz2"], index=False)
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    df = join_distances()
+    PATH_TO_REGIONS.mkdir(parents=True, exist_ok=True)
+
+    for name, by in [
+        ("plz1", "plz1"),
+        ("plz2", "plz2"),
+        ("city", ["City", "plz1"]),
+    ]:
+        statistics = aggregate_distances(df, by)
+        statistics.to_csv(PATH_TO_REGIONS / f"{name}_statistics.csv", index=False)
+        print(f"Saved the statistics for {len(statistics)} groups by {name}.")
+
+    save_partitioned(df)
+    print(f"Saved the store distances partitioned by region to {PATH_TO_REGIONS}.")
+
+
+if __name__ == "__main__":
+    main()
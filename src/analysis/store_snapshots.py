@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+"""Keeps the history of the extracted stores as deltas between snapshots.
+
+Each extraction overwrites the store tables. To still be able to analyze how the
+stores change over time, every run is recorded as a snapshot. Instead of a full
+copy, only the delta to the previous snapshot is saved: the stores that were
+added, removed or changed. Every CHECKPOINT_INTERVAL snapshots, a full copy
+(checkpoint) is saved as well, so that any snapshot can be rebuilt from the
+nearest checkpoint and a few deltas.
+
+The stores are identified by a stable key: the URL for Aldi Sued, the id for Aldi
+Nord and the coordinates and normalized address for Lidl.
+
+Layout of the snapshot directory:
+```
+manifest.json            # one entry per snapshot, in order
+deltas/<id>.parquet      # Key, Chain, Operation ("add"/"remove"/"change") + store
+checkpoints/<id>.parquet # Key, Chain + store
+```
+The first snapshot has no delta, since all its stores are additions; they are
+read from its checkpoint instead. All times are in UTC.
+Openings and closures in a time range are read from the deltas of the snapshots
+in that range only, see `SnapshotStore.events`.
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+from rich import print
+
+from deduplicate_stores import normalize_address
+
+# **************** Constants ****************
+
+PATH_TO_ALDI_SUED = Path("../../data/aldi_sued/aldi_sued.csv")
+PATH_TO_ALDI_NORD = Path("../../data/aldi_nord/aldi_nord.csv")
+PATH_TO_LIDL = Path("../../data/lidl/lidl.csv")
+PATH_TO_SNAPSHOTS = Path("../../data/snapshots")
+
+CHECKPOINT_INTERVAL = 10
+STORE_COLUMNS = ["Street", "Postal Code", "City", "Latitude", "Longitude"]
+# Explicit, so that an empty delta does not get the Parquet null type
+DELTA_SCHEMA = pa.schema(
+    [
+        ("Key", pa.string()),
+        ("Chain", pa.string()),
+        ("Operation", pa.string()),
+        ("Street", pa.string()),
+        ("Postal Code", pa.string()),
+        ("City", pa.string()),
+        ("Latitude", pa.float64()),
+        ("Longitude", pa.float64()),
+    ]
+)
+
+# **************** Helpers ****************
+
+
+def load_current_stores(
+    aldi_sued_path: Path = PATH_TO_ALDI_SUED,
+    aldi_nord_path: Path = PATH_TO_ALDI_NORD,
+    lidl_path: Path = PATH_TO_LIDL,
+) -> pd.DataFrame:
+    """Reads the extracted stores of all chains and computes their keys.
+
+    Args:
+        aldi_sued_path (optional): The path to the Aldi Sued addresses. Defaults
+          to PATH_TO_ALDI_SUED.
+        aldi_nord_path (optional): The path to the Aldi Nord addresses. Defaults
+          to PATH_TO_ALDI_NORD.
+        lidl_path (optional): The path to the Lidl addresses. Defaults to
+          PATH_TO_LIDL.
+
+    Returns:
+        A DataFrame with the columns "Key", "Chain" and STORE_COLUMNS.
+
+    Raises:
+        ValueError: If a key is not unique.
+    """
+    aldi_sued = pd.read_csv(aldi_sued_path, dtype={"Postal Code": str})
+    aldi_sued["Key"] = aldi_sued["URL"]
+
+    aldi_nord = pd.read_csv(aldi_nord_path, dtype={"ID": str, "Postal Code": str})
+    aldi_nord["Key"] = aldi_nord["ID"]
+
+    lidl = pd.read_csv(lidl_path, dtype={"Postalcode": str}).rename(
+        columns={"Postalcode": "Postal Code"}
+    )
+    lidl["Key"] = [
+        f"{lat:.5f},{lon:.5f}|{normalize_address(str(street), str(postal_code))}"
+        for lat, lon, street, postal_code in zip(
+            lidl["Latitude"], lidl["Longitude"], lidl["Street"], lidl["Postal Code"]
+        )
+    ]
+
+    df = pd.concat(
+        [
+            aldi_sued.assign(Chain="aldi_sued"),
+            aldi_nord.assign(Chain="aldi_nord"),
+            lidl.assign(Chain="lidl"),
+        ],
+        ignore_index=True,
+    )[["Key", "Chain", *STORE_COLUMNS]]
+    df["Postal Code"] = df["Postal Code"].str.strip().str.zfill(5)
+
+    duplicated = df.duplicated(["Chain", "Key"])
+    if duplicated.any():
+        raise ValueError(f"Duplicate store keys: {df.loc[duplicated, 'Key'].tolist()}")
+    return df
+
+
+def compute_delta(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """Computes the delta between two snapshots.
+
+    Args:
+        previous: The previous snapshot.
+        current: The current snapshot.
+
+    Returns:
+        A DataFrame with the columns "Key", "Chain", "Operation" and
+        STORE_COLUMNS. Added and changed stores have their current values,
+        removed stores their last values.
+    """
+    merged = previous.merge(
+        current,
+        on=["Chain", "Key"],
+        how="outer",
+        suffixes=("_previous", ""),
+        indicator=True,
+    )
+    added = merged["_merge"] == "right_only"
+    removed = merged["_merge"] == "left_only"
+    both = merged["_merge"] == "both"
+    changed = both & pd.concat(
+        [
+            merged[column].astype(str) != merged[f"{column}_previous"].astype(str)
+            for column in STORE_COLUMNS
+        ],
+        axis=1,
+    ).any(axis=1)
+
+    # Removed stores keep their last values
+    for column in STORE_COLUMNS:
+        merged[column] = merged[column].where(~removed, merged[f"{column}_previous"])
+    merged["Operation"] = None
+    merged.loc[added, "Operation"] = "add"
+    merged.loc[removed, "Operation"] = "remove"
+    merged.loc[changed, "Operation"] = "change"
+    return merged.loc[
+        added | removed | changed, ["Key", "Chain", "Operation", *STORE_COLUMNS]
+    ]
+
+
+def apply_delta(snapshot: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Applies a delta to a snapshot.
+
+    Args:
+        snapshot: The snapshot.
+        delta: The delta to the next snapshot.
+
+    Returns:
+        The next snapshot.
+    """
+    keys = pd.MultiIndex.from_frame(delta[["Chain", "Key"]])
+    unchanged = ~pd.MultiIndex.from_frame(snapshot[["Chain", "Key"]]).isin(keys)
+    upserts = delta.loc[delta["Operation"] != "remove"].drop(columns="Operation")
+    return pd.concat([snapshot.loc[unchanged], upserts], ignore_index=True)
+
+
+def save_delta(delta: pd.DataFrame, path: Path) -> None:
+    """Saves a delta with the DELTA_SCHEMA.
+
+    Args:
+        delta: The delta, see `compute_delta`.
+        path: The path of the Parquet file.
+    """
+    delta.to_parquet(path, index=False, schema=DELTA_SCHEMA)
+
+
+def to_utc(time: datetime) -> datetime:
+    """Converts a time with a timezone to UTC.
+
+    Args:
+        time: The time.
+
+    Returns:
+        The same time in UTC.
+
+    Raises:
+        ValueError: If the time has no timezone, because it would be ambiguous.
+    """
+    if time.tzinfo is None or time.utcoffset() is None:
+        raise ValueError(f"The time must have a timezone: {time.isoformat()}")
+    return time.astimezone(timezone.utc)
+
+
+# **************** Snapshot store ****************
+
+
+class SnapshotStore:
+    """Records snapshots as deltas and rebuilds them."""
+
+    def __init__(self, path: Path = PATH_TO_SNAPSHOTS) -> None:
+        """Opens the snapshot store.
+
+        Args:
+            path (optional): The directory of the snapshot store. Defaults to
+              PATH_TO_SNAPSHOTS.
+        """
+        self.path = path
+        self.manifest_path = path / "manifest.json"
+        self.manifest: list[dict[str, Any]] = []
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                self.manifest = json.load(file)
+
+    def _delta_path(self, snapshot_id: str) -> Path:
+        """Returns the path of the delta of a snapshot."""
+        return self.path / "deltas" / f"{snapshot_id}.parquet"
+
+    def _checkpoint_path(self, snapshot_id: str) -> Path:
+        """Returns the path of the checkpoint of a snapshot."""
+        return self.path / "checkpoints" / f"{snapshot_id}.parquet"
+
+    def _position(self, snapshot_id: str) -> int:
+        """Returns the position of a snapshot in the manifest.
+
+        Raises:
+            KeyError: If the snapshot does not exist.
+        """
+        for i, entry in enumerate(self.manifest):
+            if entry["id"] == snapshot_id:
+                return i
+        raise KeyError(f"Unknown snapshot: {snapshot_id}")
+
+    def snapshot(self, snapshot_id: str | None = None) -> pd.DataFrame:
+        """Rebuilds a snapshot from the nearest checkpoint and the deltas.
+
+        Args:
+            snapshot_id (optional): The id of the snapshot. Defaults to None,
+              i.e. the latest snapshot.
+
+        Returns:
+            The stores of the snapshot, with the columns "Key", "Chain" and
+            STORE_COLUMNS. Empty if there are no snapshots yet.
+        """
+        if not self.manifest:
+            return pd.DataFrame(columns=["Key", "Chain", *STORE_COLUMNS])
+        position = (
+            len(self.manifest) - 1
+            if snapshot_id is None
+            else self._position(snapshot_id)
+        )
+        start = max(i for i in range(position + 1) if self.manifest[i]["checkpoint"])
+        snapshot = pd.read_parquet(self._checkpoint_path(self.manifest[start]["id"]))
+        for entry in self.manifest[start + 1 : position + 1]:
+            snapshot = apply_delta(
+                snapshot, pd.read_parquet(self._delta_path(entry["id"]))
+            )
+        return snapshot
+
+    def _read_events(self, position: int, operations: tuple[str, ...]) -> pd.DataFrame:
+        """Reads the changes of a snapshot to its previous snapshot.
+
+        Args:
+            position: The position of the snapshot in the manifest.
+            operations: The operations to read.
+
+        Returns:
+            The matching rows of the delta of the snapshot.
+        """
+        snapshot_id = self.manifest[position]["id"]
+        if position > 0:
+            return pd.read_parquet(
+                self._delta_path(snapshot_id),
+                filters=[("Operation", "in", list(operations))],
+            )
+        # All stores of the first snapshot are additions
+        additions = pd.read_parquet(self._checkpoint_path(snapshot_id))
+        additions.insert(2, "Operation", "add")
+        return additions if "add" in operations else additions.iloc[:0]
+
+    def record(
+        self, stores: pd.DataFrame, created: datetime | None = None
+    ) -> dict[str, Any] | None:
+        """Records the stores as a new snapshot.
+
+        Nothing is recorded if the stores did not change since the latest
+        snapshot.
+
+        Args:
+            stores: The current stores, see `load_current_stores`.
+            created (optional): The time of the snapshot, with a timezone.
+              Defaults to None, i.e. now.
+
+        Returns:
+            The manifest entry of the new snapshot, or None if nothing changed.
+
+        Raises:
+            ValueError: If the time has no timezone or the snapshot is not newer
+              than the latest one.
+        """
+        created = to_utc(created or datetime.now(timezone.utc))
+        if self.manifest and created <= datetime.fromisoformat(
+            self.manifest[-1]["created"]
+        ):
+            raise ValueError("A snapshot must be newer than the latest snapshot.")
+
+        snapshot_id = created.strftime("%Y%m%dT%H%M%S%fZ")
+        delta = compute_delta(self.snapshot(), stores)
+        if self.manifest and delta.empty:
+            return None
+        checkpoint = len(self.manifest) % CHECKPOINT_INTERVAL == 0
+
+        if self.manifest:
+            (self.path / "deltas").mkdir(parents=True, exist_ok=True)
+            save_delta(delta, self._delta_path(snapshot_id))
+        if checkpoint:
+            (self.path / "checkpoints").mkdir(parents=True, exist_ok=True)
+            stores.to_parquet(self._checkpoint_path(snapshot_id), index=False)
+
+        counts = delta["Operation"].value_counts()
+        entry = {
+            "id": snapshot_id,
+            "created": created.isoformat(),
+            "checkpoint": checkpoint,
+            "stores": len(stores),
+            "added": int(counts.get("add", 0)),
+            "removed": int(counts.get("remove", 0)),
+            "changed": int(counts.get("change", 0)),
+        }
+        self.manifest.append(entry)
+        # The manifest is written last, so a failed run leaves no broken entry
+        with open(self.manifest_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, indent=2)
+        return entry
+
+    def events(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        operations: tuple[str, ...] = ("add", "remove"),
+    ) -> pd.DataFrame:
+        """Lists the openings and closures within a time range.
+
+        Only the deltas of the snapshots within the range are read. Note that the
+        first snapshot lists every store as added.
+
+        Args:
+            start (optional): The start of the range (inclusive), with a
+              timezone. Defaults to None, i.e. the first snapshot.
+            end (optional): The end of the range (inclusive), with a timezone.
+              Defaults to None, i.e. the latest snapshot.
+            operations (optional): The operations to list. Defaults to openings
+              ("add") and closures ("remove").
+
+        Returns:
+            The matching rows of the deltas with an additional "Snapshot" and
+            "Created" column.
+
+        Raises:
+            ValueError: If `start` or `end` has no timezone.
+        """
+        start = to_utc(start) if start is not None else None
+        end = to_utc(end) if end is not None else None
+        events = []
+        for position, entry in enumerate(self.manifest):
+            created = datetime.fromisoformat(entry["created"])
+            if (start is None or created >= start) and (end is None or created <= end):
+                events.append(
+                    self._read_events(position, operations).assign(
+                        Snapshot=entry["id"], Created=entry["created"]
+                    )
+                )
+        if not events:
+            return pd.DataFrame(
+                columns=[
+                    "Key",
+                    "Chain",
+                    "Operation",
+                    *STORE_COLUMNS,
+                    "Snapshot",
+                    "Created",
+                ]
+            )
+        return pd.concat(events, ignore_index=True)
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    store = SnapshotStore()
+    entry = store.record(load_current_stores())
+    if entry is None:
+        print("The stores did not change since the latest snapshot.")
+        return
+    print(
+        f"Recorded snapshot {entry['id']} with {entry['stores']} stores: "
+        f"{entry['added']} added, {entry['removed']} removed, "
+        f"{entry['changed']} changed."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+"""A compact table of all stores that can be memory-mapped.
+
+The stores of all chains are kept as a struct of arrays: one contiguous array per
+column instead of one Python object per store. Latitude and longitude are stored
+as float64, the chain as int8, and street, city, postal code and store id are
+dictionary encoded as int32 codes into lists of unique values. The store id is
+the column that identifies a store of a chain (see ID_COLUMNS), Lidl stores have
+none.
+
+The table is saved to a single binary file:
+```
+magic (8 bytes) | header length (uint32) | JSON header | padding | columns
+```
+The header contains the number of stores, the dtype and offset of each column and
+the dictionaries. Each column starts at an offset that is a multiple of 8, so
+`StoreTable.load` can memory-map the file and view the columns as arrays without
+copying or parsing them.
+"""
+
+import json
+import os
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rich import print
+
+# **************** Constants ****************
+
+PATH_TO_ALDI_SUED = Path("../../data/aldi_sued/aldi_sued_deduplicated.csv")
+PATH_TO_ALDI_NORD = Path("../../data/aldi_nord/aldi_nord_deduplicated.csv")
+PATH_TO_LIDL = Path("../../data/lidl/lidl_deduplicated.csv")
+PATH_TO_STORE_TABLE = Path("../../data/stores.bin")
+
+CHAINS = ("aldi_sued", "aldi_nord", "lidl")
+# Chain -> column of the extracted store table that identifies a store
+ID_COLUMNS = {"aldi_sued": "URL", "aldi_nord": "ID"}
+MAGIC = b"ALSTORE1"
+ALIGNMENT = 8
+COLUMN_DTYPES = {
+    "latitude": np.dtype("<f8"),
+    "longitude": np.dtype("<f8"),
+    "chain": np.dtype("i1"),
+    "street": np.dtype("<i4"),
+    "city": np.dtype("<i4"),
+    "postal_code": np.dtype("<i4"),
+    "store_id": np.dtype("<i4"),
+}
+
+# **************** Store table ****************
+
+
+class StoreTable:
+    """The stores of all chains as a struct of arrays.
+
+    Attributes:
+        columns: The arrays of the table, keyed by column name.
+        dictionaries: The unique values of the dictionary-encoded columns.
+    """
+
+    def __init__(
+        self, columns: dict[str, np.ndarray], dictionaries: dict[str, list[str]]
+    ) -> None:
+        """Initializes the table.
+
+        Args:
+            columns: The arrays of the table, keyed by column name. All arrays
+              must have the same length.
+            dictionaries: The unique values of the dictionary-encoded columns.
+        """
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self) -> int:
+        """Returns the number of stores."""
+        return len(self.columns["chain"])
+
+    @property
+    def latitude(self) -> np.ndarray:
+        """The latitudes of the stores."""
+        return self.columns["latitude"]
+
+    @property
+    def longitude(self) -> np.ndarray:
+        """The longitudes of the stores."""
+        return self.columns["longitude"]
+
+    @property
+    def chain(self) -> np.ndarray:
+        """The chain ids of the stores, indices into CHAINS."""
+        return self.columns["chain"]
+
+    def mask(self, chains: Sequence[str]) -> np.ndarray:
+        """Returns a boolean mask of the stores of the given chains.
+
+        Args:
+            chains: The names of the chains, see CHAINS.
+
+        Returns:
+            A boolean array with one entry per store.
+        """
+        return np.isin(self.chain, [CHAINS.index(chain) for chain in chains])
+
+    def coordinates(self, chains: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the coordinates of the stores of the given chains.
+
+        Args:
+            chains: The names of the chains, see CHAINS.
+
+        Returns:
+            A tuple of the latitude and the longitude arrays.
+        """
+        mask = self.mask(chains)
+        return self.latitude[mask], self.longitude[mask]
+
+    def rows(self, chains: Sequence[str]) -> np.ndarray:
+        """Returns the row positions of the stores of the given chains.
+
+        Args:
+            chains: The names of the chains, see CHAINS.
+
+        Returns:
+            The positions of the stores in the table, in ascending order.
+        """
+        return np.flatnonzero(self.mask(chains))
+
+    def store(self, row: int) -> dict[str, str | float]:
+        """Decodes a single store.
+
+        Args:
+            row: The position of the store in the table.
+
+        Returns:
+            A dictionary with the columns of the extracted store table of the
+            chain, e.g. "URL" for Aldi Sued, and the "Chain".
+        """
+        chain = CHAINS[int(self.chain[row])]
+        store: dict[str, str | float] = {
+            "Street": self.dictionaries["street"][self.columns["street"][row]],
+            "Postal Code": self.dictionaries["postal_code"][
+                self.columns["postal_code"][row]
+            ],
+            "City": self.dictionaries["city"][self.columns["city"][row]],
+            "Latitude": float(self.latitude[row]),
+            "Longitude": float(self.longitude[row]),
+            "Chain": chain,
+        }
+        if chain in ID_COLUMNS:
+            store[ID_COLUMNS[chain]] = self.dictionaries["store_id"][
+                self.columns["store_id"][row]
+            ]
+        return store
+
+    def decode(self, column: str, codes: np.ndarray) -> list[str]:
+        """Decodes the codes of a dictionary-encoded column.
+
+        Args:
+            column: The name of the column.
+            codes: The codes to decode.
+
+        Returns:
+            The decoded values.
+        """
+        dictionary = self.dictionaries[column]
+        return [dictionary[code] for code in codes.tolist()]
+
+    def to_dataframe(self, chains: Sequence[str] = CHAINS) -> pd.DataFrame:
+        """Decodes the stores of the given chains into a DataFrame.
+
+        Args:
+            chains (optional): The names of the chains. Defaults to all chains.
+
+        Returns:
+            A DataFrame with the columns "Street", "Postal Code", "City",
+            "Latitude", "Longitude", "Chain" and "Store ID" (empty for Lidl).
+        """
+        mask = self.mask(chains)
+        return pd.DataFrame(
+            {
+                "Street": self.decode("street", self.columns["street"][mask]),
+                "Postal Code": self.decode(
+                    "postal_code", self.columns["postal_code"][mask]
+                ),
+                "City": self.decode("city", self.columns["city"][mask]),
+                "Latitude": self.latitude[mask],
+                "Longitude": self.longitude[mask],
+                "Chain": [CHAINS[chain] for chain in self.chain[mask].tolist()],
+                "Store ID": self.decode("store_id", self.columns["store_id"][mask]),
+            }
+        )
+
+    @classmethod
+    def from_dataframes(cls, dfs: dict[str, pd.DataFrame]) -> "StoreTable":
+        """Builds the table from the store tables of the chains.
+
+        Args:
+            dfs: The store tables, keyed by chain name. The postal code column
+              may be called "Postal Code" or "Postalcode". The tables of the
+              chains in ID_COLUMNS must contain the id column.
+
+        Returns:
+            The store table.
+        """
+        df = pd.concat(
+            [
+                df.rename(columns={"Postalcode": "Postal Code"}).assign(
+                    Chain=chain,
+                    **{
+                        "Store ID": df[ID_COLUMNS[chain]] if chain in ID_COLUMNS else ""
+                    },
+                )
+                for chain, df in dfs.items()
+            ],
+            ignore_index=True,
+        )
+        columns: dict[str, np.ndarray] = {
+            "latitude": df["Latitude"].to_numpy(COLUMN_DTYPES["latitude"]),
+            "longitude": df["Longitude"].to_numpy(COLUMN_DTYPES["longitude"]),
+            "chain": df["Chain"].map(CHAINS.index).to_numpy(COLUMN_DTYPES["chain"]),
+        }
+        dictionaries: dict[str, list[str]] = {}
+        values = {
+            "street": df["Street"].astype(str).str.strip(),
+            "city": df["City"].astype(str).str.strip(),
+            "postal_code": df["Postal Code"].astype(str).str.strip().str.zfill(5),
+            "store_id": df["Store ID"].astype(str).str.strip(),
+        }
+        for column, series in values.items():
+            codes, uniques = pd.factorize(series)
+            columns[column] = codes.astype(COLUMN_DTYPES[column])
+            dictionaries[column] = uniques.tolist()
+        return cls(columns, dictionaries)
+
+    def save(self, path: Path = PATH_TO_STORE_TABLE) -> None:
+        """Saves the table to a binary file.
+
+        Args:
+            path (optional): The path of the file. Defaults to
+              PATH_TO_STORE_TABLE.
+        """
+        # The offsets depend on the header length, which depends on the offsets,
+        # so the offsets are relative to the start of the (aligned) data section
+        layout: dict[str, dict[str, str | int]] = {}
+        offset = 0
+        for column, dtype in COLUMN_DTYPES.items():
+            layout[column] = {"dtype": dtype.str, "offset": offset}
+            offset += _align(len(self) * dtype.itemsize)
+        header = json.dumps(
+            {
+                "n_stores": len(self),
+                "chains": CHAINS,
+                "columns": layout,
+                "dictionaries": self.dictionaries,
+            },
+            ensure_ascii=False,
+        ).encode()
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+
+        # Write to a temporary file and replace the table at once, so that
+        # processes that have mapped the old file keep reading a valid file
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(prefix + b"\0" * (_align(len(prefix)) - len(prefix)))
+            for column, dtype in COLUMN_DTYPES.items():
+                data = np.ascontiguousarray(self.columns[column], dtype=dtype)
+                file.write(data.tobytes())
+                file.write(b"\0" * (_align(data.nbytes) - data.nbytes))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path = PATH_TO_STORE_TABLE) -> "StoreTable":
+        """Memory-maps a table from a binary file.
+
+        The columns are read-only views into the mapped file; nothing is copied
+        until the columns are used.
+
+        Args:
+            path (optional): The path of the file. Defaults to
+              PATH_TO_STORE_TABLE.
+
+        Returns:
+            The store table.
+
+        Raises:
+            ValueError: If the file is not a store table.
+        """
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a store table: {path}")
+            (header_length,) = struct.unpack("<I", file.read(4))
+            header = json.loads(file.read(header_length))
+        data_start = _align(len(MAGIC) + 4 + header_length)
+
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        n_stores = header["n_stores"]
+        columns: dict[str, np.ndarray] = {}
+        for column, layout in header["columns"].items():
+            dtype = np.dtype(layout["dtype"])
+            start = data_start + layout["offset"]
+            columns[column] = buffer[start : start + n_stores * dtype.itemsize].view(
+                dtype
+            )
+        return cls(columns, header["dictionaries"])
+
+
+def _align(n_bytes: int) -> int:
+    """Rounds a number of bytes up to the next multiple of ALIGNMENT."""
+    return -(-n_bytes // ALIGNMENT) * ALIGNMENT
+
+
+# **************** Main ****************
+
+
+def main() -> None:
+    """Runs the code."""
+    dfs = {
+        "aldi_sued": pd.read_csv(PATH_TO_ALDI_SUED, dtype={"Postal Code": str}),
+        "aldi_nord": pd.read_csv(
+            PATH_TO_ALDI_NORD, dtype={"ID": str, "Postal Code": str}
+        ),
+        "lidl": pd.read_csv(PATH_TO_LIDL, dtype={"Postalcode": str}),
+    }
+    table = StoreTable.from_dataframes(dfs)
+    table.save()
+    print(f"Saved {len(table)} stores to {PATH_TO_STORE_TABLE}.")
+
+
+if __name__ == "__main__":
+    main()
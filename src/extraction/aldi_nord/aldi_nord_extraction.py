@@ -73,6 +73,7 @@ def extract_information(store_list: list[dict[str, Any]]) -> list[dict[str, str]
     """
     rows = [
         {
+            "ID": str(location["id"]),
             "Street": location["streetAndNumber"],
             "Postal Code": location["zip"],
             "City": location["city"],
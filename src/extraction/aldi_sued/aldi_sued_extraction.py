@@ -3,22 +3,23 @@
 
 import csv
 import logging
-import time
 from pathlib import Path
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from aldi_lidl.throttling import ThrottledSession
+
 # **************** Constants ****************
 
-ALDI_SUED_URLS = "../../data/raw/aldi_sued/cleaned_aldi_sued_store_urls.txt"
-HEADERS = {"User-Agent": "hobby-aldi-scraper/0.1"}
-PATH_TMP = Path("../../data/raw/aldi_sued/aldi_sued_addresses_tmp.csv")
+ALDI_SUED_URLS = "../../../data/raw/aldi_sued/cleaned_aldi_sued_store_urls.txt"
+PATH_TMP = Path("../../../data/raw/aldi_sued/aldi_sued_addresses_tmp.csv")
+PATH_TO_ADDRESS_CSV = Path("../../../data/aldi_sued/aldi_sued.csv")
+PATH_TO_ADDRESS_PARQUET = Path("../../../data/aldi_sued/aldi_sued.parquet")
 
-session = requests.Session()
-session.headers.update(HEADERS)
+# Throttles the requests and retries failed ones
+session = ThrottledSession()
 
 # **************** Helper functions ****************
 
@@ -104,12 +105,12 @@ def parse_store(store_url: str) -> dict[str, str]:
         raise ValueError(f"No coordinates for store: {store_url}")
 
     return {
-        "street": street,
-        "postalcode": postal_code,
-        "city": city,
-        "latitude": latitude,
-        "longitude": longitude,
-        "url": store_url,
+        "Street": street,
+        "Postal Code": postal_code,
+        "City": city,
+        "Latitude": latitude,
+        "Longitude": longitude,
+        "URL": store_url,
     }
 
 
@@ -128,20 +129,21 @@ def main() -> None:
     addresses: list[dict[str, str]] = []
 
     logging.info("Start crawling the addresses.")
+    # Start from an empty tmp csv, otherwise a rerun appends to the old one
+    PATH_TMP.unlink(missing_ok=True)
 
     # Fetch each address append it to the tmp csv and add them
     for url in tqdm(urls, desc="crawl stores"):
         address = parse_store(url)
         append_to_csv(address, PATH_TMP)
         addresses.append(address)
-        time.sleep(1.2)  # Polite pause for the request
 
     logging.info("Successfully crawled all store addresses.")
 
     # Create dataframe and store it as both csv and parquet
     df = pd.DataFrame(addresses)
-    df.to_parquet("../../data/aldi_sued.parquet")
-    df.to_csv("../../data/aldi_sued.csv")
+    df.to_parquet(PATH_TO_ADDRESS_PARQUET)
+    df.to_csv(PATH_TO_ADDRESS_CSV, index=False)
     logging.info("Stored the results as parquet and csv files.")
 
 
@@ -8,16 +8,19 @@ was used for the crawling.
 
 import xml.etree.ElementTree as ET
 
-import requests
+from aldi_lidl.throttling import ThrottledSession
 
 # **************** Constants ****************
 
-SITEMAP_PATH = ""
-RAW_STORE_URLS_PATH = ""
-CLEANED_STORE_URLS_PATH = ""
+SITEMAP_PATH = "../../../data/raw/aldi_sued/aldi_sitemap.xml"
+RAW_STORE_URLS_PATH = "../../../data/raw/aldi_sued/aldi_store_urls.txt"
+CLEANED_STORE_URLS_PATH = "../../../data/raw/aldi_sued/cleaned_aldi_sued_store_urls.txt"
 
 SM_URL = "https://filialen.aldi-sued.de/sitemap.xml"
 
+# Throttles the requests and retries failed ones
+session = ThrottledSession()
+
 # **************** Helper functions ****************
 
 
@@ -28,10 +31,11 @@ def save_sitemap_xml(sm_url: str, path_to_file: str) -> None:
         sm_url: URL of the sitemap file.
         path_to_file: Path to the location where file should be saved.
     """
-    xml_text = requests.get(SM_URL, timeout=20).text
+    res = session.get(sm_url, timeout=20)
+    res.raise_for_status()
 
     with open(path_to_file, "w", encoding="utf-8") as file:
-        file.write(xml_text)
+        file.write(res.text)
 
 
 def fetch_root_and_parse(sm_url: str) -> ET.Element:
@@ -43,9 +47,10 @@ def fetch_root_and_parse(sm_url: str) -> ET.Element:
     Returns:
         A parsed Element of the XML file.
     """
-    xml_text = requests.get(SM_URL, timeout=20).text
+    res = session.get(sm_url, timeout=20)
+    res.raise_for_status()
 
-    return ET.fromstring(xml_text)
+    return ET.fromstring(res.text)
 
 
 def extract_and_save_store_urls(sitemap: ET.Element, path: str) -> list[str]:
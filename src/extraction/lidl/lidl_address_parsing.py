@@ -97,6 +97,8 @@ def main():
     # fetch all links
     bing_links = read_bing_links()
     addresses: list[dict[str, str]] = []
+    # Start from an empty csv, otherwise a rerun appends to the old one
+    PATH_TO_ADDRESS_CSV.unlink(missing_ok=True)
     # process and parse link
     for link in tqdm(bing_links, desc="parse Bing links"):
         address = parse_bing_link(link)
@@ -2,14 +2,14 @@
 """Extract the URLs for the different LIDL stores."""
 
 import logging
-import time
 from pathlib import Path
 
-import requests
 from bs4 import BeautifulSoup
 from rich import print
 from tqdm import tqdm
 
+from aldi_lidl.throttling import ThrottledSession
+
 # **************** Constants ****************
 
 BASE_URL = "https://www.lidl.de"
@@ -17,9 +17,8 @@ FILIAL_SEARCH_URL = f"{BASE_URL}/f/"
 PATH_LIDL_FILIALEN_URLS = Path("../../../data/raw/lidl/lidl_filialen_urls.txt")
 PATH_BING_LINKS = Path("../../../data/raw/lidl/lidl_bing_links.txt")
 
-HEADERS = {"User-Agent": "hobby-aldi-scraper/0.1"}
-session = requests.Session()
-session.headers.update(HEADERS)
+# Throttles the requests and retries failed ones
+session = ThrottledSession()
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,7 +39,7 @@ def extract_and_save_city_urls(
           to PATH_LIDL_FILIALEN_URLS.
     """
     # fetch page
-    res = requests.get(url, timeout=15)
+    res = session.get(url, timeout=15)
     res.raise_for_status()
 
     # find all corresponding links
@@ -75,6 +74,7 @@ def extract_bing_links_for_city(city_url: str) -> list[str]:
         A list of Bing links for this city.
     """
     res = session.get(city_url, timeout=15)
+    res.raise_for_status()
     soup = BeautifulSoup(res.text, "html.parser")
     # Get all relevant elements
     rel_elems = soup.find_all("a", class_="ret-o-store-detail__store-icon-link")
@@ -130,7 +130,6 @@ def fetch_and_save_all_bing_links(
                 bing_links += links
                 file.write("\n".join(links) + "\n")
                 file.flush()  # ensure data is written to disk immediately
-                time.sleep(1.2)
             except Exception as e:
                 print(f"Error processing city {city_u}: {e}")
 
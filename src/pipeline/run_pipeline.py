@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+"""Runs the whole pipeline, from the raw data to the statistics.
+
+Each stage is one of the existing scripts, declared together with the files it
+reads and writes. The scripts use paths relative to their own directory, so each
+stage is run with its script directory as the working directory. This runner can
+therefore be started from anywhere.
+
+A stage is skipped if its outputs exist, none of the stages it depends on ran in
+this session, and the fingerprint of its inputs (the contents of the script and
+of its input files) is the same as in the last successful run. Stages without
+outputs, like printing the statistics, always run. Stages that do not depend on
+each other, like the extraction of the different chains, run concurrently.
+
+If the outputs of a stage exist but no fingerprint was recorded yet (e.g., on
+the first run in a fresh clone), the existing outputs are adopted instead of
+recreating them. Otherwise, the first run would rewrite the committed data and
+record a duplicate snapshot.
+
+The scraping stages take a long time, put load on the websites and overwrite
+hand-cleaned files (e.g., the cleaned Aldi Sued URLs). They are therefore not
+rerun when only their script changes, but only if their outputs are missing or
+an upstream stage ran. Any stage can be rerun with `--force`.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+# **************** Constants ****************
+
+ROOT = Path(__file__).resolve().parents[2]
+PATH_TO_FINGERPRINTS = ROOT / "data" / ".pipeline_fingerprints.json"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A stage of the pipeline.
+
+    Attributes:
+        name: The name of the stage.
+        script: The script, relative to the root of the repository.
+        inputs: The files the stage reads, relative to the root. This includes
+          the modules the script imports from the repository, so that changing
+          them reruns the stage.
+        outputs: The files the stage writes, relative to the root.
+        scrapes: Whether the stage scrapes a website.
+    """
+
+    name: str
+    script: str
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    scrapes: bool = False
+
+
+STAGES = (
+    Stage(
+        name="aldi_sued_urls",
+        script="src/extraction/aldi_sued/aldi_sued_url_extraction.py",
+        outputs=(
+            "data/raw/aldi_sued/aldi_sitemap.xml",
+            "data/raw/aldi_sued/aldi_store_urls.txt",
+            "data/raw/aldi_sued/cleaned_aldi_sued_store_urls.txt",
+        ),
+        scrapes=True,
+    ),
+    Stage(
+        name="aldi_sued_stores",
+        script="src/extraction/aldi_sued/aldi_sued_extraction.py",
+        inputs=("data/raw/aldi_sued/cleaned_aldi_sued_store_urls.txt",),
+        outputs=("data/aldi_sued/aldi_sued.csv", "data/aldi_sued/aldi_sued.parquet"),
+        scrapes=True,
+    ),
+    Stage(
+        name="aldi_nord_stores",
+        script="src/extraction/aldi_nord/aldi_nord_extraction.py",
+        inputs=("data/raw/aldi_nord/aldi_nord_raw.json",),
+        outputs=("data/aldi_nord/aldi_nord.csv", "data/aldi_nord/aldi_nord.parquet"),
+    ),
+    Stage(
+        name="lidl_bing_links",
+        script="src/extraction/lidl/lidl_url_extraction.py",
+        inputs=("data/raw/lidl/lidl_filialen_urls.txt",),
+        outputs=("data/raw/lidl/lidl_bing_links.txt",),
+        scrapes=True,
+    ),
+    Stage(
+        name="lidl_stores",
+        script="src/extraction/lidl/lidl_address_parsing.py",
+        inputs=("data/raw/lidl/lidl_bing_links.txt",),
+        outputs=("data/lidl/lidl.csv", "data/lidl/lidl.parquet"),
+    ),
+    Stage(
+        name="deduplication",
+        script="src/analysis/deduplicate_stores.py",
+        inputs=(
+            "data/aldi_sued/aldi_sued.csv",
+            "data/aldi_nord/aldi_nord.csv",
+            "data/lidl/lidl.csv",
+        ),
+        outputs=(
+            "data/aldi_sued/aldi_sued_deduplicated.csv",
+            "data/aldi_sued/aldi_sued_deduplicated.parquet",
+            "data/aldi_nord/aldi_nord_deduplicated.csv",
+            "data/aldi_nord/aldi_nord_deduplicated.parquet",
+            "data/lidl/lidl_deduplicated.csv",
+            "data/lidl/lidl_deduplicated.parquet",
+            "data/deduplication_report.csv",
+        ),
+    ),
+    Stage(
+        name="snapshot",
+        script="src/analysis/store_snapshots.py",
+        inputs=(
+            "data/aldi_sued/aldi_sued.csv",
+            "data/aldi_nord/aldi_nord.csv",
+            "data/lidl/lidl.csv",
+            "src/analysis/deduplicate_stores.py",
+        ),
+        outputs=("data/snapshots/manifest.json",),
+    ),
+    Stage(
+        name="store_table",
+        script="src/analysis/store_table.py",
+        inputs=(
+            "data/aldi_sued/aldi_sued_deduplicated.csv",
+            "data/aldi_nord/aldi_nord_deduplicated.csv",
+            "data/lidl/lidl_deduplicated.csv",
+        ),
+        outputs=("data/stores.bin",),
+    ),
+    Stage(
+        name="distances",
+        script="src/analysis/min_distances.py",
+        inputs=(
+            "data/stores.bin",
+            "src/analysis/store_table.py",
+            "src/analysis/deduplicate_stores.py",
+        ),
+        outputs=("data/min_distances.csv",),
+    ),
+    Stage(
+        name="regions",
+        script="src/analysis/regional_statistics.py",
+        inputs=(
+            "data/stores.bin",
+            "data/min_distances.csv",
+            "src/analysis/store_table.py",
+        ),
+        outputs=(
+            "data/regions/plz1_statistics.csv",
+            "data/regions/plz2_statistics.csv",
+            "data/regions/city_statistics.csv",
+            "data/regions/store_distances",
+        ),
+    ),
+    Stage(
+        name="statistics",
+        script="src/analysis/print_statistics.py",
+        inputs=("data/min_distances.csv",),
+    ),
+)
+
+# **************** Helpers ****************
+
+
+def hash_file(path: Path) -> str:
+    """Computes the SHA-256 hash of a file.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The hex digest, or an empty string if the file does not exist.
+    """
+    if not path.exists():
+        return ""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def fingerprint(stage: Stage) -> str:
+    """Computes the fingerprint of a stage from its script and inputs.
+
+    Args:
+        stage: The stage.
+
+    Returns:
+        The fingerprint as a hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in (stage.script, *stage.inputs):
+        digest.update(f"{path}:{hash_file(ROOT / path)}\n".encode())
+    return digest.hexdigest()
+
+
+def read_fingerprints(path: Path = PATH_TO_FINGERPRINTS) -> dict[str, str]:
+    """Reads the fingerprints of the last successful runs.
+
+    Args:
+        path (optional): The path to the fingerprint file. Defaults to
+          PATH_TO_FINGERPRINTS.
+
+    Returns:
+        A dictionary mapping the stage names to their fingerprints.
+    """
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_fingerprints(
+    fingerprints: dict[str, str], path: Path = PATH_TO_FINGERPRINTS
+) -> None:
+    """Saves the fingerprints of the successful runs.
+
+    Args:
+        fingerprints: A dictionary mapping the stage names to their fingerprints.
+        path (optional): The path to the fingerprint file. Defaults to
+          PATH_TO_FINGERPRINTS.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(fingerprints, file, indent=2, sort_keys=True)
+
+
+def get_dependencies(stages: tuple[Stage, ...]) -> dict[str, set[str]]:
+    """Derives the dependencies between stages from their inputs and outputs.
+
+    Args:
+        stages: The stages of the pipeline.
+
+    Returns:
+        A dictionary mapping each stage name to the names of the stages that
+        produce its inputs.
+    """
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {
+        stage.name: {producers[i] for i in stage.inputs if i in producers}
+        for stage in stages
+    }
+
+
+# **************** Runner ****************
+
+
+class PipelineRunner:
+    """Runs the stages in dependency order and skips the up-to-date ones."""
+
+    def __init__(
+        self, stages: tuple[Stage, ...] = STAGES, force: frozenset[str] = frozenset()
+    ) -> None:
+        """Initializes the runner.
+
+        Args:
+            stages (optional): The stages to run. Defaults to STAGES.
+            force (optional): The names of the stages to run even if they are up
+              to date. Defaults to an empty set.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.dependencies = get_dependencies(stages)
+        self.force = force
+        self.fingerprints = read_fingerprints()
+        self.done: dict[str, asyncio.Future[bool]] = {}
+        # The stages that were run (not skipped) in this session
+        self.ran: set[str] = set()
+
+    def is_up_to_date(self, stage: Stage, current_fingerprint: str) -> bool:
+        """Checks whether a stage can be skipped.
+
+        Args:
+            stage: The stage.
+            current_fingerprint: The fingerprint of its current inputs.
+
+        Returns:
+            False if the stage is forced, has no outputs (i.e. it only prints),
+            one of its outputs is missing or one of its dependencies ran in this
+            session. Otherwise, True if its fingerprint is unchanged. Stages
+            without a recorded fingerprint and scraping stages are up to date.
+        """
+        if (
+            stage.name in self.force
+            or not stage.outputs
+            or not all((ROOT / output).exists() for output in stage.outputs)
+            or self.dependencies[stage.name] & self.ran
+        ):
+            return False
+        if stage.scrapes:
+            # Changing the scraper alone does not justify scraping again
+            return True
+        recorded_fingerprint = self.fingerprints.get(stage.name)
+        if recorded_fingerprint is None:
+            # Adopt the existing (e.g., committed) outputs instead of recreating
+            # them, which would scrape again or record a duplicate snapshot
+            self.fingerprints[stage.name] = current_fingerprint
+            save_fingerprints(self.fingerprints)
+            return True
+        return recorded_fingerprint == current_fingerprint
+
+    async def run_stage(self, stage: Stage) -> bool:
+        """Runs a stage once all its dependencies have finished.
+
+        Args:
+            stage: The stage to run.
+
+        Returns:
+            True if the stage succeeded or was skipped.
+        """
+        results = [await self.done[name] for name in self.dependencies[stage.name]]
+        if not all(results):
+            logging.error(f"[{stage.name}] Skipped, because a dependency failed.")
+            return False
+
+        current_fingerprint = fingerprint(stage)
+        if self.is_up_to_date(stage, current_fingerprint):
+            logging.info(f"[{stage.name}] Up to date.")
+            return True
+
+        logging.info(f"[{stage.name}] Running {stage.script}.")
+        self.ran.add(stage.name)
+        start = time.perf_counter()
+        script = ROOT / stage.script
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, script.name, cwd=script.parent
+        )
+        if await process.wait() != 0:
+            logging.error(f"[{stage.name}] Failed with code {process.returncode}.")
+            return False
+
+        logging.info(f"[{stage.name}] Done in {time.perf_counter() - start:.1f}s.")
+        # Store the fingerprint of the inputs the stage actually ran on
+        self.fingerprints[stage.name] = current_fingerprint
+        save_fingerprints(self.fingerprints)
+        return True
+
+    async def run(self) -> bool:
+        """Runs all stages, independent ones concurrently.
+
+        Returns:
+            True if all stages succeeded or were skipped.
+        """
+        loop = asyncio.get_running_loop()
+        self.done = {name: loop.create_future() for name in self.stages}
+
+        async def run_and_resolve(stage: Stage) -> None:
+            """Runs a stage and resolves its future for the dependents."""
+            self.done[stage.name].set_result(await self.run_stage(stage))
+
+        await asyncio.gather(*(run_and_resolve(s) for s in self.stages.values()))
+        return all(future.result() for future in self.done.values())
+
+
+# **************** Main ****************
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Runs the code.
+
+    Args:
+        argv (optional): The command line arguments. Defaults to `sys.argv`.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        default=[],
+        choices=[stage.name for stage in STAGES],
+        help="Stages to run even if they are up to date.",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(levelname)s: %(message)s",
+    )
+    start = time.perf_counter()
+    success = asyncio.run(PipelineRunner(force=frozenset(args.force)).run())
+    logging.info(f"Pipeline finished in {time.perf_counter() - start:.1f}s.")
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()